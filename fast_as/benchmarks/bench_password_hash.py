@@ -0,0 +1,34 @@
+"""
+Benchmark bcrypt verification throughput per core at each cost.
+
+Use it to choose PASSWORD_HASH_ROUNDS / PASSWORD_HASH_TARGET_MS deliberately:
+each extra round doubles the work per login, halving login capacity.
+
+    python benchmarks/bench_password_hash.py --min-rounds 10 --max-rounds 14
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import BCRYPT_MAX_ROUNDS, BCRYPT_MIN_ROUNDS, measure_pswd_verify_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-rounds", type=int, default=BCRYPT_MIN_ROUNDS)
+    parser.add_argument("--max-rounds", type=int, default=BCRYPT_MAX_ROUNDS - 1)
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    print(f"{'rounds':>6}  {'verify ms':>9}  {'verifies/s/core':>15}  {f'verifies/s ({cores} cores)':>22}")
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        seconds = measure_pswd_verify_time(rounds, samples=args.samples)
+        per_core = 1 / seconds
+        print(f"{rounds:>6}  {seconds * 1000:>9.1f}  {per_core:>15.1f}  {per_core * cores:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
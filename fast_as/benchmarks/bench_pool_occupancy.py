@@ -0,0 +1,70 @@
+"""
+Measure peak database pool occupancy for a request mix.
+
+Runs a weighted mix of requests against a running server with a fixed
+concurrency, then reads the pool counters from GET /admin/pool:
+
+    python benchmarks/bench_pool_occupancy.py --base-url http://localhost:8000 \
+        --token <admin access token> --requests 2000 --concurrency 50 \
+        --mix "GET /books/=6,GET /books/user=2,GET /tags/=2,GET /auth/me=1"
+
+Compare peak_in_use and avg_hold_ms between builds to see the effect of
+connection handling changes on the same mix.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+
+def parse_mix(mix: str) -> list[tuple[str, str, int]]:
+    entries = []
+    for item in mix.split(","):
+        request, _, weight = item.rpartition("=")
+        method, _, path = request.strip().partition(" ")
+        entries.append((method, path, int(weight)))
+    return entries
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="access token of an admin user")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", default="GET /books/=6,GET /books/user=2,GET /tags/=2,GET /auth/me=1")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    headers = {"Authorization": f"Bearer {args.token}"}
+    statuses: dict[int, int] = {}
+
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=30) as client:
+        (await client.post("/admin/pool/reset")).raise_for_status()
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for method, path, _ in random.choices(mix, weights=[w for *_, w in mix], k=args.requests):
+            queue.put_nowait((method, path))
+
+        async def run() -> None:
+            while not queue.empty():
+                method, path = queue.get_nowait()
+                response = await client.request(method, path)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        pool = (await client.get("/admin/pool")).json()
+
+    print(f"requests:     {args.requests} in {elapsed:.2f}s ({args.requests / elapsed:.1f} req/s)")
+    print(f"statuses:     {statuses}")
+    for key, value in pool.items():
+        print(f"{key + ':':<14}{value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
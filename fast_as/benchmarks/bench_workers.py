@@ -0,0 +1,98 @@
+"""
+Benchmark requests per second against the number of server workers.
+
+For each worker count, starts `serve.py --workers N`, waits until it reports ready,
+drives it with a fixed number of concurrent keep-alive clients for a fixed
+duration, then stops it with SIGTERM:
+
+    python benchmarks/bench_workers.py --workers 1,2,4,8 --path / \
+        --concurrency 64 --duration 15
+
+Pass --token to benchmark an authenticated route such as /books/. Run the
+load generator on a different machine (or pinned to other cores) when
+possible, otherwise it competes with the workers for CPU.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/health/ready")
+            if response.status_code == 200:
+                return
+            await asyncio.sleep(0.2)
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def drive(client: httpx.AsyncClient, path: str, concurrency: int, duration: float) -> tuple[int, int]:
+    deadline = time.monotonic() + duration
+    ok = errors = 0
+
+    async def run() -> None:
+        nonlocal ok, errors
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(path)
+                if response.status_code < 400:
+                    ok += 1
+                else:
+                    errors += 1
+            except httpx.TransportError:
+                errors += 1
+
+    await asyncio.gather(*(run() for _ in range(concurrency)))
+    return ok, errors
+
+
+async def bench(workers: int, args: argparse.Namespace) -> tuple[float, int]:
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(args.port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}", headers=headers, limits=limits, timeout=30
+        ) as client:
+            await wait_until_up(client)
+            await drive(client, args.path, args.concurrency, min(3.0, args.duration))  # warm up
+            ok, errors = await drive(client, args.path, args.concurrency, args.duration)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    return ok / args.duration, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--token", default=None)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7}  {'req/s':>10}  {'errors':>7}")
+    for workers in (int(n) for n in args.workers.split(",")):
+        rps, errors = asyncio.run(bench(workers, args))
+        print(f"{workers:>7}  {rps:>10.1f}  {errors:>7}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Profile worker cold start.
+
+Prints the slowest imports of `import main`, from `python -X importtime`,
+ranked by cumulative and by self time:
+
+    python benchmarks/profile_startup.py --top 25
+
+With --serve, also starts one uvicorn worker several times and reports how
+long it takes to answer /health/live (imported and serving) and
+/health/ready (pools warm), which is what an autoscaler waits for:
+
+    python benchmarks/profile_startup.py --serve --runs 5
+
+Imports are profiled in a fresh interpreter, after one untimed run that
+compiles the bytecode.
+"""
+import argparse
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile_imports(module: str) -> list[tuple[str, int, int, int]]:
+    """
+    Import `module` in a fresh interpreter with -X importtime.
+    Returns:
+        list[tuple[str, int, int, int]]: (module, self µs, cumulative µs, depth) per import.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr.splitlines()[-1] if result.stderr else f"importing {module} failed")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def print_import_report(rows: list[tuple[str, int, int, int]], top: int) -> None:
+    total = sum(self_us for _, self_us, _, _ in rows)
+    print(f"{len(rows)} modules imported in {total / 1000:.1f} ms\n")
+
+    print("Slowest by cumulative time (including their own imports)")
+    print(f"{'cumulative ms':>13}  {'self ms':>8}  module")
+    for name, self_us, cumulative_us, _ in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>13.1f}  {self_us / 1000:>8.1f}  {name}")
+
+    print("\nSlowest by self time (module body only)")
+    print(f"{'self ms':>8}  module")
+    for name, self_us, _, _ in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"{self_us / 1000:>8.1f}  {name}")
+
+    # first-party modules are the ones we can make lazier
+    local = {os.path.splitext(entry)[0] for entry in os.listdir(ROOT)}
+    own = [r for r in rows if r[0].split(".")[0] in local]
+    print("\nFirst-party modules")
+    print(f"{'cumulative ms':>13}  {'self ms':>8}  module")
+    for name, self_us, cumulative_us, _ in sorted(own, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>13.1f}  {self_us / 1000:>8.1f}  {name}")
+
+
+def time_to_ready(port: int, timeout: float = 60) -> tuple[float, float]:
+    """
+    Start one uvicorn worker and time its readiness.
+    Returns:
+        tuple[float, float]: Seconds until /health/live and until /health/ready answer 200.
+    """
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    live = ready = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while ready is None and time.perf_counter() - start < timeout:
+                try:
+                    if live is None and client.get("/health/live").status_code == 200:
+                        live = time.perf_counter() - start
+                    if live is not None and client.get("/health/ready").status_code == 200:
+                        ready = time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    if ready is None:
+        raise RuntimeError("worker did not become ready")
+    return live, ready
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8101)
+    args = parser.parse_args()
+
+    profile_imports(args.module)  # compile bytecode so the report measures imports only
+    print_import_report(profile_imports(args.module), args.top)
+
+    if args.serve:
+        timings = [time_to_ready(args.port) for _ in range(args.runs)]
+        print(f"\nCold start over {args.runs} runs (median)")
+        print(f"  live:  {statistics.median(t[0] for t in timings) * 1000:.0f} ms")
+        print(f"  ready: {statistics.median(t[1] for t in timings) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import re
+from bisect import bisect_left, insort
+from typing import Any, Awaitable, Callable, Iterable
+from fastapi.concurrency import run_in_threadpool
+from redis.exceptions import RedisError
+from database.redis import get_blocking_client, get_token_blocklist
+from database.db_config import Config
+
+logger = logging.getLogger(__name__)
+
+# (kind, text, uid): kind is "title", "author" or "tag"; uid is the book or tag
+# UID. Many books share an author, so an author term's uid is one of its books;
+# the index keeps the author while any of them remains and returns it with uid "".
+Term = tuple[str, str, str]
+
+# capped stream of index changes written after book and tag commits; every API
+# worker tails it so all in-process indexes converge
+AUTOCOMPLETE_CHANGES_KEY = "autocomplete:changes"
+AUTOCOMPLETE_CHANGES_MAXLEN = 10000
+
+# words of a term after the first that are indexed too, so "pot" finds
+# "Harry Potter"; later words are only reachable through earlier ones
+INDEXED_WORDS = 4
+
+_WORD_START = re.compile(r"(?<=\s)\S")
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+def _keys(text: str) -> list[str]:
+    normalized = normalize(text)
+    starts = [0] + [m.start() for m in _WORD_START.finditer(normalized)][:INDEXED_WORDS]
+    return list(dict.fromkeys(normalized[start:] for start in starts))
+
+
+def book_terms(book: Any) -> list[Term]:
+    """The title and author terms of a book."""
+    return [("title", book.title, str(book.uid)), ("author", book.author, str(book.uid))]
+
+def _indexed_term(term: Term) -> tuple[Term, str]:
+    """The term as stored and searched, and the book or tag it comes from."""
+    kind, text, uid = term
+    return ((kind, text, "") if kind == "author" else term), uid
+
+def tag_term(tag: Any) -> Term:
+    return ("tag", tag.name, str(tag.uid))
+
+
+class PrefixIndex:
+    """
+    In-process prefix index over a sorted array.
+    Each term is stored under its full text and the start of its first words,
+    as (key, kind, text, uid) tuples kept sorted so a prefix lookup is one
+    bisect plus a scan of the matches. Each term keeps the set of books or
+    tags it comes from, since one author has many books, and is dropped when
+    the last one goes. Adding or removing the same source twice changes
+    nothing, so changes replayed from the stream after a reload are harmless.
+    The index stops accepting new terms at `max_entries` keys; the next full
+    reload keeps the most recent ones.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: list[tuple[str, str, str, str]] = []
+        self._sources: dict[Term, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, term: Term) -> bool:
+        """Add a term, or another source of it. Returns False if the index is full."""
+        term, source = _indexed_term(term)
+        sources = self._sources.get(term)
+        if sources:
+            sources.add(source)
+            return True
+        keys = _keys(term[1])
+        if not keys[0] or len(self._entries) + len(keys) > self.max_entries:
+            return False
+        self._sources[term] = {source}
+        for key in keys:
+            insort(self._entries, (key, *term))
+        return True
+
+    def remove(self, term: Term) -> None:
+        """Remove one source of a term, and the term once none are left."""
+        term, source = _indexed_term(term)
+        sources = self._sources.get(term)
+        if sources is None:
+            return
+        sources.discard(source)
+        if sources:
+            return
+        del self._sources[term]
+        for key in _keys(term[1]):
+            entry = (key, *term)
+            index = bisect_left(self._entries, entry)
+            if index < len(self._entries) and self._entries[index] == entry:
+                del self._entries[index]
+
+    def search(self, prefix: str, limit: int = 10, kind: str | None = None) -> list[Term]:
+        """
+        Terms with a key starting with `prefix`, in key order, without duplicates.
+        Args:
+            prefix (str): The typed prefix; matched case-insensitively.
+            limit (int): The maximum number of terms.
+            kind (str, optional): Only return terms of this kind.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results: dict[Term, None] = {}
+        index = bisect_left(self._entries, (prefix,))
+        while index < len(self._entries) and len(results) < limit:
+            key, *term = self._entries[index]
+            if not key.startswith(prefix):
+                break
+            if kind is None or term[0] == kind:
+                results[tuple(term)] = None
+            index += 1
+        return list(results)
+
+    def replace(self, terms: Iterable[Term]) -> None:
+        """Rebuild the index from all terms, stopping at the cap."""
+        sources_by_term: dict[Term, set[str]] = {}
+        entries: list[tuple[str, str, str, str]] = []
+        for term in terms:
+            term, source = _indexed_term(term)
+            sources = sources_by_term.get(term)
+            if sources is not None:
+                sources.add(source)
+                continue
+            keys = _keys(term[1])
+            if not keys[0]:
+                continue
+            if len(entries) + len(keys) > self.max_entries:
+                break
+            sources_by_term[term] = {source}
+            entries.extend((key, *term) for key in keys)
+        entries.sort()
+        self._entries, self._sources = entries, sources_by_term
+
+
+autocomplete_index = PrefixIndex(Config.AUTOCOMPLETE_MAX_ENTRIES)
+
+
+async def publish_autocomplete_changes(removed: Iterable[Term] = (), added: Iterable[Term] = ()) -> None:
+    """
+    Publish index changes after a commit. Every worker, including this one,
+    applies them from the stream within a moment.
+    Errors are logged and swallowed; workers catch up at their next full reload.
+    Args:
+        removed (Iterable[Term]): Terms whose row was deleted or changed.
+        added (Iterable[Term]): Terms of new or changed rows.
+    """
+    change = {"removed": [list(t) for t in removed], "added": [list(t) for t in added]}
+    if not change["removed"] and not change["added"]:
+        return
+    try:
+        await get_token_blocklist().xadd(
+            AUTOCOMPLETE_CHANGES_KEY, {"change": json.dumps(change)},
+            maxlen=AUTOCOMPLETE_CHANGES_MAXLEN, approximate=True,
+        )
+    except RedisError as e:
+        logger.warning("Publishing autocomplete changes failed: %s", e)
+
+def _apply_change(data: str) -> None:
+    change = json.loads(data)
+    for term in change["removed"]:
+        autocomplete_index.remove(tuple(term))
+    for term in change["added"]:
+        autocomplete_index.add(tuple(term))
+
+async def run_autocomplete_sync(load_terms: Callable[[], Awaitable[list[Term]]], stop: asyncio.Event) -> None:
+    """
+    Keep `autocomplete_index` current: load it from the database, then apply
+    changes from the stream as they arrive, and reload it every
+    AUTOCOMPLETE_RELOAD_INTERVAL seconds to repair anything missed.
+    Args:
+        load_terms (Callable): Coroutine function returning every term, newest rows first.
+        stop (asyncio.Event): Set to stop syncing.
+    """
+    client = get_blocking_client()
+    last_id = None
+    next_reload = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        try:
+            if loop.time() >= next_reload:
+                # read the stream position first, so changes committed during the load are
+                # replayed; replaying one the load already saw changes nothing. Without
+                # Redis the index still loads and follows only changes made from here on;
+                # the next reload repairs anything missed
+                try:
+                    latest = await client.xrevrange(AUTOCOMPLETE_CHANGES_KEY, count=1)
+                    last_id = latest[0][0] if latest else "0-0"
+                except RedisError as e:
+                    logger.warning("Reading the autocomplete stream position failed: %s", e)
+                    last_id = "$"
+                terms = await load_terms()
+                # sorting a large index takes a while; keep the event loop serving
+                await run_in_threadpool(autocomplete_index.replace, terms)
+                next_reload = loop.time() + Config.AUTOCOMPLETE_RELOAD_INTERVAL
+                logger.info("Autocomplete index loaded with %d keys", len(autocomplete_index))
+            streams = await client.xread({AUTOCOMPLETE_CHANGES_KEY: last_id}, count=500, block=1000)
+            for _, messages in streams:
+                for message_id, fields in messages:
+                    _apply_change(fields["change"])
+                    last_id = message_id
+        except Exception:
+            logger.exception("Autocomplete sync failed, retrying")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=5)
+            except TimeoutError:
+                pass
@@ -0,0 +1,68 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a dependency is down instead of waiting for its timeouts.
+    Closed: calls go through; `failure_threshold` consecutive failures open it.
+    Open: calls are rejected by `allow` for `reset_timeout` seconds.
+    Half-open: one trial call goes through; its success closes the breaker and
+    its failure opens it again. Other calls are rejected meanwhile, unless the
+    trial has not reported back within `reset_timeout` (e.g. it was cancelled).
+    Args:
+        name (str): The dependency, used in log messages.
+        failure_threshold (int): Consecutive failures that open the breaker.
+        reset_timeout (float): Seconds to stay open before a trial call.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_started_at: float | None = None
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; claims the trial call when half-open."""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._trial_started_at = None
+        if self._trial_started_at is not None and now - self._trial_started_at < self.reset_timeout:
+            return False
+        self._trial_started_at = now
+        return True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Circuit breaker for %s closed", self.name)
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_started_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_started_at = None
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    "Circuit breaker for %s opened after %d failures; failing fast for %.1fs",
+                    self.name, self.failures, self.reset_timeout,
+                )
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {"name": self.name, "state": self.state, "failures": self.failures}
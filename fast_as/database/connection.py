@@ -1,25 +1,142 @@
+import time
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel import SQLModel, text
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from typing import AsyncGenerator
 from database.db_config import Config
+from database.slow_query import SlowQueryLog
+from tracing import end_span, span, start_span
+
+# statement text kept on a span; bulk inserts can run to megabytes
+MAX_TRACED_STATEMENT_LENGTH = 1000
+
+
+class TracedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Pool whose checkouts are traced, including waits for a free slot and new connections."""
+    def _do_get(self):
+        with span("db.pool.checkout", **{"db.pool.size": self.size()}):
+            return super()._do_get()
+
 
 engine = create_async_engine(
         url=Config.DATABASE_URL,
-        echo=True,
+        # statements are logged through logging_config when DB_ECHO is set
+        echo=False,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        poolclass=TracedAsyncAdaptedQueuePool,
+        query_cache_size=Config.DB_QUERY_CACHE_SIZE,
+        connect_args=(
+            {"prepared_statement_cache_size": Config.DB_PREPARED_STATEMENT_CACHE_SIZE}
+            if "asyncpg" in Config.DATABASE_URL else {}
+        ),
 )
 
+Session = sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+
+class PoolOccupancy:
+    """Track how many pooled connections are checked out and for how long."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.in_use = 0
+        self.peak = 0
+        self.checkouts = 0
+        self.total_hold = 0.0
+        self.max_hold = 0.0
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        connection_record.info["checkout_at"] = time.perf_counter()
+        self.in_use += 1
+        self.checkouts += 1
+        self.peak = max(self.peak, self.in_use)
+
+    def on_checkin(self, dbapi_connection, connection_record) -> None:
+        checkout_at = connection_record.info.pop("checkout_at", None)
+        if checkout_at is None:
+            return
+        held = time.perf_counter() - checkout_at
+        self.in_use -= 1
+        self.total_hold += held
+        self.max_hold = max(self.max_hold, held)
+
+    def snapshot(self) -> dict:
+        return {
+            "pool_size": engine.pool.size(),
+            "in_use": self.in_use,
+            "peak_in_use": self.peak,
+            "checkouts": self.checkouts,
+            "avg_hold_ms": round(self.total_hold / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "max_hold_ms": round(self.max_hold * 1000, 2),
+        }
+
+
+pool_occupancy = PoolOccupancy()
+event.listen(engine.sync_engine.pool, "checkout", pool_occupancy.on_checkout)
+event.listen(engine.sync_engine.pool, "checkin", pool_occupancy.on_checkin)
+
+slow_query_log = SlowQueryLog(
+    Config.SLOW_QUERY_THRESHOLD_MS, Config.SLOW_QUERY_BUFFER_SIZE, explain=Config.SLOW_QUERY_EXPLAIN
+)
+slow_query_log.install(engine)
+
+
+def _start_statement_span(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._trace_span = start_span("db.statement", {
+        "db.system": conn.dialect.name,
+        "db.statement": statement[:MAX_TRACED_STATEMENT_LENGTH],
+        "db.executemany": executemany,
+    })
+
+def _end_statement_span(conn, cursor, statement, parameters, context, executemany) -> None:
+    end_span(getattr(context, "_trace_span", None))
+
+def _fail_statement_span(exception_context) -> None:
+    context = exception_context.execution_context
+    if context is not None:
+        end_span(getattr(context, "_trace_span", None), exception_context.original_exception)
+        context._trace_span = None
+
+event.listen(engine.sync_engine, "before_cursor_execute", _start_statement_span)
+event.listen(engine.sync_engine, "after_cursor_execute", _end_statement_span)
+event.listen(engine.sync_engine, "handle_error", _fail_statement_span)
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    Session = sessionmaker(
-        bind=engine,
-        class_=AsyncSession,
-        expire_on_commit=False,
-    )
+    """
+    Yield a session for the request.
+    The session checks out a connection only when it runs its first statement,
+    so handlers that never touch the database never occupy a pool slot.
+    """
     async with Session() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+def json_aggregation_enabled() -> bool:
+    """Whether nested read documents can be built in the database in one query."""
+    return Config.DB_JSON_AGGREGATION and engine.dialect.name == "postgresql"
+
+
+async def release_connection(session: AsyncSession) -> None:
+    """
+    Return the session's connection to the pool if it has only been reading.
+    The session stays usable: loaded objects are kept (expire_on_commit=False)
+    and the next statement checks out a fresh connection.
+    Args:
+        session (AsyncSession): The request session.
+    """
+    if session.in_transaction() and not (session.new or session.dirty or session.deleted):
+        await session.commit()
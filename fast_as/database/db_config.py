@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,8 +8,118 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
-    
+    DB_ECHO: bool = False
+    # per-process pool sizes; serve.py derives them from the *_TOTAL_* limits
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    REDIS_MAX_CONNECTIONS: int | None = None
+    # compiled statements kept by SQLAlchemy per engine
+    DB_QUERY_CACHE_SIZE: int = 1200
+    # prepared statements kept by asyncpg per connection
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
+    # build nested read documents in Postgres with json_build_object/json_agg
+    DB_JSON_AGGREGATION: bool = True
+
+    # logging (logging_config.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_SAMPLE_RATE: float = 0.1
+
+    # outbox dispatcher (worker.py)
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETENTION_HOURS: int = 24
+    # seconds a claimed event is hidden from other dispatchers while its handlers
+    # run; one still unprocessed after that is claimed again
+    OUTBOX_LEASE_SECONDS: int = 600
+
+    RATE_LIMIT_ENABLED: bool = True
+    RESPONSE_CACHE_TTL: int = 300
+    # bodies smaller than this are not compressed; bodies of at least
+    # COMPRESSION_THREAD_THRESHOLD bytes are compressed in the thread pool
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_THREAD_THRESHOLD: int = 65536
+
+    # production server (serve.py)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    WEB_CONCURRENCY: int | None = None
+    WEB_MAX_WORKERS: int = 16
+    DB_POOL_TOTAL_LIMIT: int = 80
+    REDIS_TOTAL_MAX_CONNECTIONS: int = 400
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = 30
+    ACCESS_LOG: bool = False
+
+    # trending books (database/trending.py); scores halve every half-life,
+    # the worker decays them every TRENDING_DECAY_INTERVAL seconds
+    TRENDING_VIEW_WEIGHT: float = 1.0
+    TRENDING_REVIEW_WEIGHT: float = 5.0
+    TRENDING_HALF_LIFE_HOURS: float = 24.0
+    TRENDING_DECAY_INTERVAL: int = 600
+    TRENDING_MIN_SCORE: float = 0.01
+    TRENDING_MAX_BOOKS: int = 1000
+
+    # similar books (services/similar_book_service.py), rebuilt by
+    # `python worker.py --rebuild-similar-books` and refreshed on tag changes
+    SIMILAR_BOOKS_TOP_K: int = 20
+    SIMILAR_BOOKS_METRIC: str = "jaccard"
+    SIMILAR_BOOKS_MEMORY_TTL: int = 60
+
+    # facet counts for GET /books/facets (database/facet_cache.py)
+    FACET_COUNTS_TTL: int = 3600
+    FACET_VALUE_LIMIT: int = 50
+
+    # in-process autocomplete index (database/autocomplete.py)
+    AUTOCOMPLETE_MAX_ENTRIES: int = 500000
+    AUTOCOMPLETE_RELOAD_INTERVAL: int = 3600
+
+    # slow-query log (database/slow_query.py), see GET /admin/slow_queries
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_BUFFER_SIZE: int = 500
+    SLOW_QUERY_EXPLAIN: bool = True
+
+    # per-request CPU profiles (middleware/profiling.py): admins request one
+    # with "X-Profile: 1"; PROFILE_SAMPLE_RATE profiles a random share of all requests
+    PROFILE_DIR: str = "profiles"
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL: float = 0.001
+    PROFILE_MAX_FILES: int = 200
+
+    # request tracing (tracing.py): spans for pool checkouts, statements, Redis
+    # calls, JWT decoding and password hashing, appended to TRACE_FILE as OTLP/JSON
+    TRACING_ENABLED: bool = False
+    TRACE_FILE: str = "traces.jsonl"
+    TRACE_SAMPLE_RATE: float = 1.0
+
+    # books with more reviews than this are deleted by the worker, this many
+    # reviews per transaction (services/book_service.py)
+    BOOK_DELETE_BATCH_SIZE: int = 1000
+
+    # Redis access (database/redis.py): pools block up to REDIS_POOL_TIMEOUT
+    # seconds for a free connection when REDIS_MAX_CONNECTIONS are in use, and
+    # REDIS_BREAKER_FAILURE_THRESHOLD consecutive connection errors or timeouts
+    # make every call fail fast for REDIS_BREAKER_RESET_TIMEOUT seconds
+    REDIS_SOCKET_TIMEOUT: float = 0.25
+    REDIS_CONNECT_TIMEOUT: float = 0.5
+    REDIS_POOL_TIMEOUT: float = 0.25
+    REDIS_HEALTH_CHECK_INTERVAL: int = 15
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = 5
+    REDIS_BREAKER_RESET_TIMEOUT: float = 5.0
+    # what TokenBearer does when the blocklist cannot be read: "deny" answers
+    # 503, "allow" accepts the otherwise valid token
+    REDIS_BLOCKLIST_FAILURE_POLICY: Literal["deny", "allow"] = "deny"
+
+    # bcrypt cost: fixed if PASSWORD_HASH_ROUNDS is set, otherwise calibrated
+    # at startup so one verification takes about PASSWORD_HASH_TARGET_MS
+    PASSWORD_HASH_ROUNDS: int | None = None
+    PASSWORD_HASH_TARGET_MS: float = 250.0
+
+    # prebuilt OpenAPI schema loaded at startup instead of generating it;
+    # serve.py writes one for its workers
+    OPENAPI_SCHEMA_PATH: str | None = None
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
-Config = Settings()
\ No newline at end of file
+Config = Settings()
@@ -0,0 +1,121 @@
+import logging
+from typing import Mapping
+from redis.exceptions import RedisError
+from database.redis import get_token_blocklist
+from database.db_config import Config
+
+logger = logging.getLogger(__name__)
+
+# book fields that can be filtered on and counted
+FACET_FIELDS = ("author", "publisher", "language")
+
+# one hash of value -> number of books per facet; the marker key exists while
+# the hashes hold complete counts, so increments are never applied to a
+# partially built or expired cache
+FACETS_READY_KEY = "facets:ready"
+
+def facet_key(field: str) -> str:
+    return f"facets:{field}"
+
+# KEYS = ready marker, then one hash per facet field in FACET_FIELDS order;
+# ARGV = triples of (facet index, value, delta)
+ADJUST_FACETS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 3 do
+    local key = KEYS[tonumber(ARGV[i]) + 1]
+    if redis.call('HINCRBY', key, ARGV[i + 1], ARGV[i + 2]) <= 0 then
+        redis.call('HDEL', key, ARGV[i + 1])
+    end
+end
+return 1
+"""
+
+_adjust_facets = None
+
+def _get_adjust_facets_script():
+    global _adjust_facets
+    if _adjust_facets is None:
+        _adjust_facets = get_token_blocklist().register_script(ADJUST_FACETS_SCRIPT)
+    return _adjust_facets
+
+async def get_cached_facet_counts() -> dict[str, dict[str, int]] | None:
+    """
+    Get the unfiltered facet counts in one round trip.
+    Returns:
+        dict[str, dict[str, int]] | None: The number of books per value of each
+        facet field, or None if the counts are not cached or Redis is unavailable.
+    """
+    try:
+        async with get_token_blocklist().pipeline(transaction=True) as pipe:
+            pipe.exists(FACETS_READY_KEY)
+            for field in FACET_FIELDS:
+                pipe.hgetall(facet_key(field))
+            ready, *hashes = await pipe.execute()
+    except RedisError as e:
+        logger.warning("Reading facet counts failed: %s", e)
+        return None
+    if not ready:
+        return None
+    return {field: {value: int(count) for value, count in counts.items()} for field, counts in zip(FACET_FIELDS, hashes)}
+
+async def store_facet_counts(counts: Mapping[str, Mapping[str, int]]) -> None:
+    """
+    Cache complete unfiltered facet counts for FACET_COUNTS_TTL seconds.
+    The TTL bounds the drift from increments lost to Redis errors or raced
+    with this write.
+    Args:
+        counts (Mapping[str, Mapping[str, int]]): The number of books per value of each facet field.
+    """
+    ttl = Config.FACET_COUNTS_TTL
+    try:
+        async with get_token_blocklist().pipeline(transaction=True) as pipe:
+            for field in FACET_FIELDS:
+                pipe.delete(facet_key(field))
+                if counts.get(field):
+                    pipe.hset(facet_key(field), mapping=dict(counts[field]))
+                    pipe.expire(facet_key(field), ttl)
+            pipe.set(FACETS_READY_KEY, 1, ex=ttl)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning("Caching facet counts failed: %s", e)
+
+async def adjust_facet_counts(
+    removed: Mapping[str, str] | None = None, added: Mapping[str, str] | None = None
+) -> None:
+    """
+    Move one book between facet values in the cached counts, e.g. after a
+    create (added only), update (both) or delete (removed only).
+    Does nothing while the counts are not cached. On a Redis error the cached
+    counts are dropped so the next read recomputes them.
+    Args:
+        removed (Mapping[str, str], optional): The book's previous facet values by field.
+        added (Mapping[str, str], optional): The book's new facet values by field.
+    """
+    args: list = []
+    for index, field in enumerate(FACET_FIELDS):
+        before = (removed or {}).get(field)
+        after = (added or {}).get(field)
+        if before == after:
+            continue
+        if before is not None:
+            args += [index, before, -1]
+        if after is not None:
+            args += [index, after, 1]
+    if not args:
+        return
+    try:
+        await _get_adjust_facets_script()(
+            keys=[FACETS_READY_KEY, *(facet_key(field) for field in FACET_FIELDS)], args=args
+        )
+    except RedisError as e:
+        logger.warning("Adjusting facet counts failed: %s", e)
+        await invalidate_facet_counts()
+
+async def invalidate_facet_counts() -> None:
+    """Drop the cached facet counts; errors are logged and the counts expire with their TTL."""
+    try:
+        await get_token_blocklist().delete(FACETS_READY_KEY)
+    except RedisError as e:
+        logger.warning("Invalidating facet counts failed: %s", e)
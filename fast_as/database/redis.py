@@ -1,34 +1,325 @@
+import logging
+import math
+import time
+from collections import OrderedDict
 import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError, NoScriptError, RedisError, TimeoutError
+from database.circuit_breaker import CircuitBreaker
 from database.db_config import Config
+from tracing import span
 
-JTI_EXPIRY = 3600
+logger = logging.getLogger(__name__)
 
-token_blocklist = redis.Redis(
-    host=Config.REDIS_HOST,
-    port=Config.REDIS_PORT,
-    db=0,
-    decode_responses=True,
-)
+# per-user revocation epoch: tokens whose "epoch" claim (issue time in ms) is
+# older than the stored value were revoked by a log out everywhere
+REVOKED_BEFORE_KEY_PREFIX = "revoked_before:"
+# per-user claims version, set when a role changes: access tokens carrying an
+# older "claims_version" claim were issued with the old role
+CLAIMS_VERSION_KEY_PREFIX = "claims_version:"
 
-async def add_jti_to_blocklist(jti: str) -> None:
+# number of request-serving client pools per process, used by serve.py to split
+# REDIS_TOTAL_MAX_CONNECTIONS across workers once the fixed-size blocking pool
+# of each process is set aside
+REDIS_POOLS_PER_PROCESS = 2
+REDIS_BLOCKING_POOL_SIZE = 2
+
+# Clients are created on first use rather than at import, so importing the app
+# opens no pools until a request or warm-up needs Redis.
+_clients: dict[str, redis.Redis] = {}
+
+# pool size when REDIS_MAX_CONNECTIONS is unset, i.e. outside serve.py
+DEFAULT_MAX_CONNECTIONS = 50
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling Redis while the circuit breaker is open."""
+
+
+_breaker: CircuitBreaker | None = None
+
+def get_redis_breaker() -> CircuitBreaker:
+    """The circuit breaker shared by every client of this process."""
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker(
+            "redis", Config.REDIS_BREAKER_FAILURE_THRESHOLD, Config.REDIS_BREAKER_RESET_TIMEOUT
+        )
+    return _breaker
+
+async def _guarded(call, span_name: str):
+    breaker = get_redis_breaker()
+    with span(span_name):
+        if not breaker.allow():
+            raise CircuitOpenError("Redis circuit breaker is open")
+        try:
+            result = await call()
+        except (ConnectionError, TimeoutError):
+            breaker.record_failure()
+            raise
+    breaker.record_success()
+    return result
+
+
+class GuardedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        return await _guarded(
+            lambda: super(GuardedPipeline, self).execute(raise_on_error), "redis.pipeline"
+        )
+
+
+class GuardedRedis(redis.Redis):
+    """
+    Client whose commands, scripts and pipelines go through the circuit breaker,
+    each traced as one span. Only connection errors and timeouts count as
+    failures; command errors such as a wrong type mean Redis is up.
+    """
+    async def execute_command(self, *args, **options):
+        return await _guarded(
+            lambda: super(GuardedRedis, self).execute_command(*args, **options), f"redis.{args[0]}"
+        )
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> GuardedPipeline:
+        return GuardedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def _create_client(
+    decode_responses: bool,
+    socket_timeout: float | None = None,
+    max_connections: int | None = None,
+) -> GuardedRedis:
+    pool = redis.BlockingConnectionPool(
+        host=Config.REDIS_HOST,
+        port=Config.REDIS_PORT,
+        db=0,
+        decode_responses=decode_responses,
+        max_connections=max_connections or Config.REDIS_MAX_CONNECTIONS or DEFAULT_MAX_CONNECTIONS,
+        # seconds to wait for a free connection before raising ConnectionError
+        timeout=Config.REDIS_POOL_TIMEOUT,
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=Config.REDIS_CONNECT_TIMEOUT,
+        socket_keepalive=True,
+        # PING connections idle for longer before reuse, so a dead one is
+        # replaced instead of failing the request that picks it up
+        health_check_interval=Config.REDIS_HEALTH_CHECK_INTERVAL,
+    )
+    return GuardedRedis.from_pool(pool)
+
+def get_token_blocklist() -> redis.Redis:
+    """Client for the token blocklist and rate limits; responses are decoded to str."""
+    client = _clients.get("token_blocklist")
+    if client is None:
+        client = _clients["token_blocklist"] = _create_client(
+            decode_responses=True, socket_timeout=Config.REDIS_SOCKET_TIMEOUT
+        )
+    return client
+
+def get_response_cache_client() -> redis.Redis:
+    """Binary client for cached response bodies, which must not be decoded."""
+    client = _clients.get("response_cache")
+    if client is None:
+        client = _clients["response_cache"] = _create_client(
+            decode_responses=False, socket_timeout=Config.REDIS_SOCKET_TIMEOUT
+        )
+    return client
+
+def get_blocking_client() -> redis.Redis:
+    """
+    Decoded client without a socket timeout for blocking reads such as XREAD
+    BLOCK, which would otherwise time out while waiting for data. Its small
+    pool serves the background tasks of this process only.
+    """
+    client = _clients.get("blocking")
+    if client is None:
+        client = _clients["blocking"] = _create_client(
+            decode_responses=True, max_connections=REDIS_BLOCKING_POOL_SIZE
+        )
+    return client
+
+def get_pool_stats() -> dict[str, dict]:
+    """Connection counts of every client created so far, with the breaker state."""
+    stats = {}
+    for name, client in _clients.items():
+        pool = client.connection_pool
+        stats[name] = {
+            "max_connections": pool.max_connections,
+            "in_use": len(pool._in_use_connections),
+            "idle": len(pool._available_connections),
+        }
+    return {"pools": stats, "breaker": get_redis_breaker().snapshot()}
+
+async def close_redis_clients() -> None:
+    """Close the connection pools of every client created so far."""
+    while _clients:
+        _, client = _clients.popitem()
+        await client.aclose()
+
+async def add_jti_to_blocklist(jti: str, expires_at: int) -> None:
     """
-    Add a JWT ID (jti) to the blocklist in Redis.
+    Add a JWT ID (jti) to the blocklist in Redis until the token expires;
+    after that the token is rejected anyway, so the entry can go.
     Args:
         jti (str): The JWT ID to add to the blocklist.
+        expires_at (int): The token's exp claim, a Unix timestamp.
     """
-    await token_blocklist.set(
+    ttl = math.ceil(expires_at - time.time())
+    if ttl <= 0:
+        return
+    await get_token_blocklist().set(
         name=jti,
         value="",
-        ex=JTI_EXPIRY
+        ex=ttl
     )
 
-async def token_in_blocklist(jti: str) -> bool:
+async def revoke_user_tokens(user_uid: str, max_token_lifetime: int) -> int:
+    """
+    Revoke every token issued to a user so far with one write, by moving the
+    user's revocation epoch to now.
+    Args:
+        user_uid (str): The UID of the user.
+        max_token_lifetime (int): Seconds the longest-lived token stays valid;
+            the epoch is dropped once every token it revokes has expired.
+    Returns:
+        int: The new epoch, in milliseconds.
+    """
+    epoch = int(time.time() * 1000)
+    await get_token_blocklist().set(f"{REVOKED_BEFORE_KEY_PREFIX}{user_uid}", epoch, ex=max_token_lifetime)
+    return epoch
+
+async def publish_claims_version(user_uid: str, claims_version: int, max_token_lifetime: int) -> None:
+    """
+    Reject the user's access tokens issued before a role change.
+    Args:
+        user_uid (str): The UID of the user.
+        claims_version (int): The user's new claims version.
+        max_token_lifetime (int): Seconds an access token stays valid; the key
+            is dropped once every token it rejects has expired.
+    """
+    await get_token_blocklist().set(
+        f"{CLAIMS_VERSION_KEY_PREFIX}{user_uid}", claims_version, ex=max_token_lifetime
+    )
+
+def _queue_revocation_checks(pipe, token_data: dict) -> None:
+    uid = token_data["user"]["uid"]
+    pipe.exists(token_data["jti"])
+    pipe.get(f"{REVOKED_BEFORE_KEY_PREFIX}{uid}")
+    pipe.get(f"{CLAIMS_VERSION_KEY_PREFIX}{uid}")
+
+def _revoked(token_data: dict, blocked: int, revoked_before: str | None, claims_version: str | None) -> bool:
+    # tokens issued before epochs or claims versions existed carry none and count as oldest
+    if blocked or (revoked_before is not None and token_data.get("epoch", 0) < int(revoked_before)):
+        return True
+    # refresh tokens carry no role; /auth/refresh_token reads the current one
+    return (
+        claims_version is not None and not token_data.get("refresh")
+        and token_data["user"].get("claims_version", 0) < int(claims_version)
+    )
+
+async def token_revoked(token_data: dict) -> bool:
+    """
+    Check whether a token is revoked by its jti, by its user's revocation
+    epoch or, for access tokens, by a role change, in one round trip.
+    Args:
+        token_data (dict): The decoded token.
+    Returns:
+        bool: True if the token has been revoked, False otherwise.
+    """
+    async with get_token_blocklist().pipeline(transaction=False) as pipe:
+        _queue_revocation_checks(pipe, token_data)
+        return _revoked(token_data, *await pipe.execute())
+
+#rate limiting
+
+# Token bucket stored as a hash {tokens, ts}. Refill, check and consume happen
+# atomically in one round trip; Redis TIME is used so API servers with skewed
+# clocks share the same bucket correctly.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+local allowed = 0
+local retry_after = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+else
+    retry_after = math.ceil((requested - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return {allowed, retry_after}
+"""
+
+_token_bucket = None
+
+def _get_token_bucket():
+    global _token_bucket
+    if _token_bucket is None:
+        _token_bucket = get_token_blocklist().register_script(TOKEN_BUCKET_SCRIPT)
+    return _token_bucket
+
+LOCAL_BUCKETS_MAX = 10000
+_local_buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+def _consume_local_token(key: str, rate: float, capacity: int) -> tuple[bool, float]:
+    """In-process token bucket used while Redis is unreachable; limits are per worker."""
+    now = time.monotonic()
+    tokens, ts = _local_buckets.pop(key, (float(capacity), now))
+    tokens = min(capacity, tokens + (now - ts) * rate)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    _local_buckets[key] = (tokens, now)
+    if len(_local_buckets) > LOCAL_BUCKETS_MAX:
+        _local_buckets.popitem(last=False)
+    return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+async def _bucket_and_revocation(key: str, rate: float, capacity: int, token_data: dict | None) -> list:
+    # EVALSHA queued directly: calling the Script with client=pipe would add a
+    # SCRIPT EXISTS round trip to every execute
+    async with get_token_blocklist().pipeline(transaction=False) as pipe:
+        pipe.evalsha(_get_token_bucket().sha, 1, key, rate, capacity, 1)
+        if token_data is not None:
+            _queue_revocation_checks(pipe, token_data)
+        return await pipe.execute()
+
+async def consume_rate_limit_token(
+    key: str, rate: float, capacity: int, token_data: dict | None = None
+) -> tuple[bool, int, bool | None]:
     """
-    Check if a JWT ID (jti) is in the blocklist in Redis.
+    Take one token from a rate limit bucket, and check whether the caller's
+    token is revoked in the same round trip.
+    Falls back to an in-process bucket when Redis is unavailable.
     Args:
-        jti (str): The JWT ID to check.
+        key (str): The bucket key, e.g. "rate:auth:login:ip:127.0.0.1".
+        rate (float): The refill rate in tokens per second.
+        capacity (int): The bucket size, i.e. the allowed burst.
+        token_data (dict, optional): The caller's decoded token, if any.
     Returns:
-        bool: True if the jti is blocked, False otherwise.
+        tuple[bool, int, bool | None]: Whether the request is allowed, the seconds
+        to wait if not, and whether the token is revoked (None if not checked).
     """
-    value = await token_blocklist.get(jti)
-    return value is not None
\ No newline at end of file
+    try:
+        try:
+            results = await _bucket_and_revocation(key, rate, capacity, token_data)
+        except NoScriptError:
+            # first call since Redis restarted; load the script and go again
+            await get_token_blocklist().script_load(TOKEN_BUCKET_SCRIPT)
+            results = await _bucket_and_revocation(key, rate, capacity, token_data)
+    except RedisError as e:
+        logger.warning("Rate limiting falling back to in-process buckets: %s", e)
+        allowed, retry_after = _consume_local_token(key, rate, capacity)
+        return allowed, math.ceil(retry_after), None
+    allowed, retry_after_ms = results[0]
+    revoked = _revoked(token_data, *results[1:]) if token_data is not None else None
+    return bool(allowed), math.ceil(int(retry_after_ms) / 1000), revoked
@@ -0,0 +1,145 @@
+import logging
+from typing import Any, Awaitable, Callable, Iterable
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from redis.exceptions import RedisError
+from database.redis import get_response_cache_client
+from database.db_config import Config
+from middleware.compression import SUPPORTED_ENCODINGS, compress_body_async, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+# surrogate key for the collection of all books, purged when a book is added or removed
+BOOKS_SURROGATE_KEY = "books"
+TAGS_SURROGATE_KEY = "tags"
+
+def book_surrogate_key(book_uid: Any) -> str:
+    return f"book:{book_uid}"
+
+def tag_surrogate_key(tag_uid: Any) -> str:
+    return f"tag:{tag_uid}"
+
+def response_cache_key(request: Request) -> str:
+    """
+    Build the cache key of a request from its route and sorted query parameters.
+    Args:
+        request (Request): The incoming request.
+    Returns:
+        str: The cache key.
+    """
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"resp:{request.url.path}?{query}"
+
+def _variant_key(key: str, encoding: str) -> str:
+    return f"{key}:{encoding}"
+
+async def get_cached_response(key: str, encoding: str | None = None) -> tuple[bytes | None, bytes | None]:
+    """
+    Get a cached response body and, if requested, its compressed variant.
+    Both are read in a single round trip.
+    Args:
+        key (str): The cache key.
+        encoding (str, optional): The negotiated content encoding.
+    Returns:
+        tuple[bytes | None, bytes | None]: The serialized body and the compressed
+        variant; each is None on a miss or Redis error.
+    """
+    try:
+        if encoding is None:
+            return await get_response_cache_client().get(key), None
+        body, variant = await get_response_cache_client().mget(key, _variant_key(key, encoding))
+        return body, variant
+    except RedisError as e:
+        logger.warning("Response cache read failed: %s", e)
+        return None, None
+
+async def set_cached_response(
+    key: str, body: bytes | None, surrogate_keys: Iterable[str], variants: dict[str, bytes] | None = None
+) -> None:
+    """
+    Store a response body and/or its compressed variants, tagged with surrogate keys.
+    Args:
+        key (str): The cache key.
+        body (bytes, optional): The serialized response body; None to store variants only.
+        surrogate_keys (Iterable[str]): Keys that purge this entry when purged.
+        variants (dict[str, bytes], optional): Compressed bodies keyed by encoding.
+    """
+    ttl = Config.RESPONSE_CACHE_TTL
+    try:
+        async with get_response_cache_client().pipeline(transaction=False) as pipe:
+            if body is not None:
+                pipe.set(key, body, ex=ttl)
+            for encoding, variant in (variants or {}).items():
+                pipe.set(_variant_key(key, encoding), variant, ex=ttl)
+            for surrogate_key in surrogate_keys:
+                pipe.sadd(f"sk:{surrogate_key}", key)
+                pipe.expire(f"sk:{surrogate_key}", ttl)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning("Response cache write failed: %s", e)
+
+async def purge_surrogate_keys(*surrogate_keys: str) -> None:
+    """
+    Delete every cached response, and its compressed variants, tagged with any
+    of the given surrogate keys.
+    Errors are logged and swallowed; entries then expire with their TTL.
+    Args:
+        *surrogate_keys (str): The surrogate keys to purge.
+    """
+    if not surrogate_keys:
+        return
+    try:
+        sets = [f"sk:{surrogate_key}" for surrogate_key in surrogate_keys]
+        redis_client = get_response_cache_client()
+        keys = [key.decode() for key in await redis_client.sunion(sets)]
+        variant_keys = [_variant_key(key, encoding) for key in keys for encoding in SUPPORTED_ENCODINGS]
+        await redis_client.delete(*keys, *variant_keys, *sets)
+    except RedisError as e:
+        logger.warning("Response cache purge of %s failed: %s", surrogate_keys, e)
+
+async def cached_json_response(
+    request: Request,
+    adapter: TypeAdapter,
+    load: Callable[[], Awaitable[Any]],
+    surrogate_keys: Callable[[Any], Iterable[str]],
+) -> Response:
+    """
+    Serve a JSON response from the cache, or load, serialize and cache it.
+    When the client accepts compression, the compressed variant is cached too,
+    so the same bytes are not compressed again on later hits.
+    Args:
+        request (Request): The incoming request.
+        adapter (TypeAdapter): The adapter of the response model, used to serialize.
+        load (Callable): Coroutine function returning the data on a miss.
+        surrogate_keys (Callable): Maps the loaded data to its surrogate keys.
+    Returns:
+        Response: The JSON response with an X-Cache header of HIT or MISS.
+    """
+    key = response_cache_key(request)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    body, variant = await get_cached_response(key, encoding)
+    if variant is not None:
+        return _json_response(variant, "HIT", encoding)
+
+    keys: list[str] = []
+    cache_state = "HIT"
+    if body is None:
+        cache_state = "MISS"
+        data = await load()
+        body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+        keys = list(surrogate_keys(data))
+
+    if encoding is None or len(body) < Config.COMPRESSION_MINIMUM_SIZE:
+        if cache_state == "MISS":
+            await set_cached_response(key, body, keys)
+        return _json_response(body, cache_state)
+
+    variant = await compress_body_async(body, encoding, Config.COMPRESSION_THREAD_THRESHOLD)
+    await set_cached_response(key, body if cache_state == "MISS" else None, keys, {encoding: variant})
+    return _json_response(variant, cache_state, encoding)
+
+def _json_response(body: bytes, cache_state: str, encoding: str | None = None) -> Response:
+    headers = {"X-Cache": cache_state, "Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,136 @@
+import logging
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Iterable, Mapping
+from redis.exceptions import RedisError
+from database.redis import get_response_cache_client
+from database.db_config import Config
+
+logger = logging.getLogger(__name__)
+
+# hash of book uid -> packed list of its most similar books
+SIMILAR_BOOKS_KEY = "similar:books"
+
+# Each neighbour is packed as its 16-byte UUID and its similarity quantized to
+# a uint16, i.e. 18 bytes, so top-20 lists for 100k books take about 36 MB.
+_NEIGHBOUR = struct.Struct(">16sH")
+SCORE_SCALE = 65535
+
+# rows written per HSET while storing a rebuild
+STORE_BATCH_SIZE = 1000
+
+MEMORY_CACHE_MAX = 10000
+_memory_cache: "OrderedDict[str, tuple[float, list[tuple[str, float]]]]" = OrderedDict()
+
+Neighbours = list[tuple[str, float]]
+
+def pack_neighbours(neighbours: Iterable[tuple[str, float]]) -> bytes:
+    """
+    Pack a list of similar books.
+    Args:
+        neighbours (Iterable[tuple[str, float]]): Book UIDs and similarities in [0, 1].
+    Returns:
+        bytes: 18 bytes per book.
+    """
+    return b"".join(
+        _NEIGHBOUR.pack(uuid.UUID(str(uid)).bytes, round(min(1.0, max(0.0, score)) * SCORE_SCALE))
+        for uid, score in neighbours
+    )
+
+def unpack_neighbours(data: bytes) -> Neighbours:
+    """Reverse `pack_neighbours`."""
+    return [
+        (str(uuid.UUID(bytes=uid)), score / SCORE_SCALE)
+        for uid, score in _NEIGHBOUR.iter_unpack(data)
+    ]
+
+def _remember(book_uid: str, neighbours: Neighbours) -> None:
+    _memory_cache.pop(book_uid, None)
+    _memory_cache[book_uid] = (time.monotonic() + Config.SIMILAR_BOOKS_MEMORY_TTL, neighbours)
+    if len(_memory_cache) > MEMORY_CACHE_MAX:
+        _memory_cache.popitem(last=False)
+
+async def get_similar_books(book_uid: Any) -> Neighbours:
+    """
+    Get the most similar books of a book, from process memory or Redis.
+    Lists are kept in memory for SIMILAR_BOOKS_MEMORY_TTL seconds, so refreshes
+    reach every worker within that time.
+    Args:
+        book_uid: The UID of the book.
+    Returns:
+        list[tuple[str, float]]: Book UIDs and similarities, most similar first;
+        empty if none were computed or Redis is unavailable.
+    """
+    book_uid = str(book_uid)
+    cached = _memory_cache.get(book_uid)
+    if cached is not None and cached[0] > time.monotonic():
+        _memory_cache.move_to_end(book_uid)
+        return cached[1]
+    try:
+        data = await get_response_cache_client().hget(SIMILAR_BOOKS_KEY, book_uid)
+    except RedisError as e:
+        logger.warning("Reading similar books of %s failed: %s", book_uid, e)
+        return cached[1] if cached is not None else []
+    neighbours = unpack_neighbours(data) if data else []
+    _remember(book_uid, neighbours)
+    return neighbours
+
+async def load_similar_books(book_uids: Iterable[str]) -> dict[str, Neighbours]:
+    """
+    Read the stored lists of several books in one round trip.
+    Args:
+        book_uids (Iterable[str]): The UIDs of the books.
+    Returns:
+        dict[str, list[tuple[str, float]]]: The stored list of each book; empty if none.
+    """
+    book_uids = [str(uid) for uid in book_uids]
+    if not book_uids:
+        return {}
+    values = await get_response_cache_client().hmget(SIMILAR_BOOKS_KEY, book_uids)
+    return {uid: unpack_neighbours(data) if data else [] for uid, data in zip(book_uids, values)}
+
+async def store_similar_books(similar: Mapping[str, Neighbours], replace: bool = False) -> None:
+    """
+    Store the lists of several books.
+    Args:
+        similar (Mapping[str, list[tuple[str, float]]]): The list of each book; an
+            empty list removes the book's entry.
+        replace (bool): Replace the whole hash, as after a full rebuild. The new
+            hash is written under a temporary key and renamed, so readers never
+            see a partial rebuild.
+    """
+    client = get_response_cache_client()
+    key = f"{SIMILAR_BOOKS_KEY}:building" if replace else SIMILAR_BOOKS_KEY
+    items = list(similar.items())
+    async with client.pipeline(transaction=replace) as pipe:
+        if replace:
+            pipe.delete(key)
+        for start in range(0, len(items), STORE_BATCH_SIZE):
+            batch = items[start:start + STORE_BATCH_SIZE]
+            mapping = {uid: pack_neighbours(neighbours) for uid, neighbours in batch if neighbours}
+            removed = [uid for uid, neighbours in batch if not neighbours]
+            if mapping:
+                pipe.hset(key, mapping=mapping)
+            if removed and not replace:
+                pipe.hdel(key, *removed)
+        if replace:
+            if any(neighbours for _, neighbours in items):
+                pipe.rename(key, SIMILAR_BOOKS_KEY)
+            else:
+                pipe.delete(SIMILAR_BOOKS_KEY)
+        await pipe.execute()
+    for uid, neighbours in items:
+        if uid in _memory_cache:
+            _remember(uid, neighbours)
+
+async def delete_similar_books(book_uid: Any) -> None:
+    """
+    Remove a deleted book's list. Lists that mention it are cleaned up by the
+    next rebuild; readers skip books that no longer exist.
+    Args:
+        book_uid: The UID of the deleted book.
+    """
+    await get_response_cache_client().hdel(SIMILAR_BOOKS_KEY, str(book_uid))
+    _memory_cache.pop(str(book_uid), None)
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# the ASGI scope of the request being served, set by RequestContextMiddleware;
+# the router adds the matched route to the same dict, so statements are
+# attributed to the route template rather than the raw path
+request_scope: ContextVar[dict | None] = ContextVar("request_scope", default=None)
+
+# statements that can be explained; transaction control and the like are not
+EXPLAINABLE = ("select", "insert", "update", "delete", "with")
+# plans kept per statement text, and how long before a statement is re-explained
+PLAN_CACHE_MAX = 256
+PLAN_TTL = 600
+MAX_PARAM_LENGTH = 100
+MAX_PARAMS = 20
+
+def current_route() -> str | None:
+    """The method and route template of the request being served, e.g. "GET /books/{book_uid}"."""
+    scope = request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+
+def _summarize_params(parameters) -> list[str] | None:
+    if parameters is None:
+        return None
+    values = parameters.values() if isinstance(parameters, dict) else parameters
+    summary = []
+    for value in list(values)[:MAX_PARAMS]:
+        text = repr(value)
+        summary.append(text if len(text) <= MAX_PARAM_LENGTH else text[:MAX_PARAM_LENGTH] + "...")
+    return summary
+
+
+class SlowQueryLog:
+    """
+    Time every statement with cursor-execute hooks and keep the ones slower
+    than `threshold_ms` in a ring buffer of `size` entries.
+    The first time a statement text is seen slow (and again after PLAN_TTL
+    seconds) its plan is captured with EXPLAIN on a separate connection, in
+    the background, one at a time, so requests never wait for it.
+    Args:
+        threshold_ms (float): Statements taking at least this long are kept.
+        size (int): The number of slow executions kept.
+        explain (bool): Capture plans; only on PostgreSQL.
+    """
+    def __init__(self, threshold_ms: float, size: int, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.entries: deque = deque(maxlen=size)
+        self.plans: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._engine: AsyncEngine | None = None
+        self._explaining = False
+        self._explain_task: asyncio.Task | None = None
+
+    def install(self, engine: AsyncEngine) -> None:
+        """Listen to the engine's cursor executions."""
+        self._engine = engine
+        event.listen(engine.sync_engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        context._query_start = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed_ms = (time.perf_counter() - context._query_start) * 1000
+        if elapsed_ms < self.threshold_ms or statement.startswith("EXPLAIN"):
+            return
+        self.entries.append({
+            "statement": statement,
+            "duration_ms": round(elapsed_ms, 2),
+            "parameters": None if executemany else _summarize_params(parameters),
+            "route": current_route(),
+            "at": time.time(),
+        })
+        if self.explain and not executemany and self._needs_plan(statement):
+            self._schedule_explain(statement, parameters)
+
+    def _needs_plan(self, statement: str) -> bool:
+        if self._explaining or self._engine is None or self._engine.dialect.name != "postgresql":
+            return False
+        if not statement.lstrip().lower().startswith(EXPLAINABLE):
+            return False
+        cached = self.plans.get(statement)
+        return cached is None or time.monotonic() - cached[0] > PLAN_TTL
+
+    def _schedule_explain(self, statement: str, parameters) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._explaining = True
+        self._explain_task = loop.create_task(self._explain(statement, parameters))
+
+    async def _explain(self, statement: str, parameters) -> None:
+        try:
+            async with self._engine.connect() as conn:
+                result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE off) {statement}", parameters)
+                plan = "\n".join(row[0] for row in result)
+                # EXPLAIN of a write plans it without running it; end the transaction anyway
+                await conn.rollback()
+            self.plans.pop(statement, None)
+            self.plans[statement] = (time.monotonic(), plan)
+            if len(self.plans) > PLAN_CACHE_MAX:
+                self.plans.popitem(last=False)
+        except Exception as e:
+            logger.warning("Capturing the plan of a slow query failed: %s", e)
+        finally:
+            self._explaining = False
+
+    def worst(self, limit: int = 20, order_by: str = "total") -> list[dict]:
+        """
+        The slowest statements in the buffer, grouped by statement text.
+        Args:
+            limit (int): The number of statements.
+            order_by (str): "total" (summed duration), "max" or "count".
+        Returns:
+            list[dict]: Per statement: count, total, mean and max duration, the
+            routes it ran from, the parameters of its slowest run and its plan.
+        """
+        groups: dict[str, dict] = {}
+        for entry in list(self.entries):
+            group = groups.get(entry["statement"])
+            if group is None:
+                group = groups[entry["statement"]] = {
+                    "statement": entry["statement"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "routes": set(), "slowest_parameters": None, "last_seen": 0.0,
+                }
+            group["count"] += 1
+            group["total_ms"] += entry["duration_ms"]
+            if entry["duration_ms"] >= group["max_ms"]:
+                group["max_ms"] = entry["duration_ms"]
+                group["slowest_parameters"] = entry["parameters"]
+            if entry["route"]:
+                group["routes"].add(entry["route"])
+            group["last_seen"] = max(group["last_seen"], entry["at"])
+        key = {"max": "max_ms", "count": "count"}.get(order_by, "total_ms")
+        worst = sorted(groups.values(), key=lambda group: group[key], reverse=True)[:limit]
+        for group in worst:
+            group["total_ms"] = round(group["total_ms"], 2)
+            group["mean_ms"] = round(group["total_ms"] / group["count"], 2)
+            group["routes"] = sorted(group["routes"])
+            plan = self.plans.get(group["statement"])
+            group["plan"] = plan[1] if plan else None
+        return worst
+
+    def reset(self) -> None:
+        self.entries.clear()
+        self.plans.clear()
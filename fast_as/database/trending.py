@@ -0,0 +1,134 @@
+import logging
+from typing import Any, Mapping
+from redis.exceptions import RedisError
+from database.redis import get_token_blocklist
+from database.db_config import Config
+
+logger = logging.getLogger(__name__)
+
+# sorted set of book uid -> decayed activity score
+TRENDING_KEY = "trending:books"
+# Redis time in ms of the last decay
+TRENDING_DECAYED_AT_KEY = "trending:decayed_at"
+# outbox events already counted, kept long enough to cover redeliveries
+TRENDING_EVENT_KEY_PREFIX = "trending:event:"
+TRENDING_EVENT_TTL = 86400
+# a worker sleeping exactly one interval may call back slightly early
+DECAY_CLOCK_SLACK_MS = 1000
+
+# Count an outbox event once: the marker and the increments are applied
+# atomically, so a redelivered event is a no-op.
+# KEYS[1] = trending set, KEYS[2] = event marker; ARGV = ttl, uid1, score1, uid2, score2, ...
+RECORD_EVENT_SCRIPT = """
+if not redis.call('SET', KEYS[2], 1, 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('ZINCRBY', KEYS[1], ARGV[i + 1], ARGV[i])
+end
+return 1
+"""
+
+# Decay by the time actually elapsed since the last decay, measured on the
+# Redis clock, so scores lose half their weight per half-life however many
+# workers call this and however late they are. Multiplying a set in place is a
+# one-key ZUNIONSTORE with a weight.
+# KEYS[1] = trending set, KEYS[2] = last decay time;
+# ARGV = min interval ms, half-life ms, min score, max books
+DECAY_SCRIPT = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local last = tonumber(redis.call('GET', KEYS[2]))
+if last == nil then
+    redis.call('SET', KEYS[2], now)
+    return 0
+end
+local elapsed = now - last
+if elapsed < tonumber(ARGV[1]) then
+    return 0
+end
+local factor = 0.5 ^ (elapsed / tonumber(ARGV[2]))
+redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', tostring(factor))
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[3])
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[4]) + 1))
+redis.call('SET', KEYS[2], now)
+return 1
+"""
+
+_scripts: dict[str, Any] = {}
+
+def _get_script(script: str):
+    if script not in _scripts:
+        _scripts[script] = get_token_blocklist().register_script(script)
+    return _scripts[script]
+
+async def record_book_view(book_uid: Any) -> None:
+    """
+    Add a view to a book's trending score.
+    Errors are logged and swallowed; a lost view only makes the score slightly lower.
+    Args:
+        book_uid: The UID of the viewed book.
+    """
+    try:
+        await get_token_blocklist().zincrby(TRENDING_KEY, Config.TRENDING_VIEW_WEIGHT, str(book_uid))
+    except RedisError as e:
+        logger.warning("Recording view of book %s failed: %s", book_uid, e)
+
+async def record_book_reviews(event_uid: Any, review_counts: Mapping[str, int]) -> None:
+    """
+    Add new reviews to the trending scores of their books, once per outbox event.
+    Redis errors propagate so the outbox retries the event.
+    Args:
+        event_uid: The UID of the outbox event carrying the reviews.
+        review_counts (Mapping[str, int]): The number of new reviews per book UID.
+    """
+    args: list[Any] = [TRENDING_EVENT_TTL]
+    for book_uid, count in review_counts.items():
+        args += [str(book_uid), count * Config.TRENDING_REVIEW_WEIGHT]
+    await _get_script(RECORD_EVENT_SCRIPT)(
+        keys=[TRENDING_KEY, f"{TRENDING_EVENT_KEY_PREFIX}{event_uid}"], args=args
+    )
+
+async def remove_book(book_uid: Any) -> None:
+    """
+    Remove a deleted book from the trending set.
+    Args:
+        book_uid: The UID of the deleted book.
+    """
+    await get_token_blocklist().zrem(TRENDING_KEY, str(book_uid))
+
+async def get_trending_book_uids(limit: int) -> list[tuple[str, float]]:
+    """
+    Get the highest scoring books.
+    Args:
+        limit (int): The maximum number of books.
+    Returns:
+        list[tuple[str, float]]: Book UIDs and scores, highest first; empty on a Redis error.
+    """
+    try:
+        return await get_token_blocklist().zrevrange(TRENDING_KEY, 0, limit - 1, withscores=True)
+    except RedisError as e:
+        logger.warning("Reading trending books failed: %s", e)
+        return []
+
+async def decay_trending(interval: float) -> bool:
+    """
+    Decay every trending score by the time elapsed since the last decay, then
+    drop books below TRENDING_MIN_SCORE and all but the TRENDING_MAX_BOOKS best.
+    Calls less than `interval` seconds after the last decay do nothing, so
+    several workers can call this on the same schedule.
+    Args:
+        interval (float): The minimum seconds between decays.
+    Returns:
+        bool: True if this call decayed the set.
+    """
+    decayed = await _get_script(DECAY_SCRIPT)(
+        keys=[TRENDING_KEY, TRENDING_DECAYED_AT_KEY],
+        args=[
+            int(interval * 1000) - DECAY_CLOCK_SLACK_MS,
+            int(Config.TRENDING_HALF_LIFE_HOURS * 3600 * 1000),
+            Config.TRENDING_MIN_SCORE,
+            Config.TRENDING_MAX_BOOKS,
+        ],
+    )
+    return bool(decayed)
@@ -1,15 +1,19 @@
+import logging
+import math
 from fastapi.security import HTTPBearer
 from fastapi import Request, status, Depends
 from fastapi.exceptions import HTTPException
 from fastapi.security.http import HTTPAuthorizationCredentials
 from utils import decode_token
-from database.redis import token_in_blocklist
+from database.redis import token_revoked, consume_rate_limit_token
+from database.db_config import Config
+from redis.exceptions import RedisError
 from sqlmodel.ext.asyncio.session import AsyncSession
-from database.connection import get_session
+from database.connection import get_session, release_connection
 from typing import Annotated
 from services.user_service import UserService
-from models.user_model import User
 
+logger = logging.getLogger(__name__)
 user_service = UserService()
 
 class TokenBearer(HTTPBearer):
@@ -36,7 +40,7 @@ class TokenBearer(HTTPBearer):
                 detail="This token is invalid or has expired",
             )
         
-        if await token_in_blocklist(token_data['jti']):
+        if await self.token_revoked(request, token_data):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail={
@@ -50,6 +54,34 @@ class TokenBearer(HTTPBearer):
 
         return token_data
     
+    async def token_revoked(self, request: Request, token_data: dict) -> bool:
+        """
+        Check the blocklist and the user's revocation epoch, reusing the answer
+        RateLimiter fetched in its pipeline for this request if there is one.
+        While Redis is unavailable REDIS_BLOCKLIST_FAILURE_POLICY decides:
+        "deny" answers 503, "allow" accepts the token.
+        Args:
+            request (Request): The incoming request.
+            token_data (dict): The decoded token.
+        Returns:
+            bool: True if the token has been revoked.
+        """
+        revoked = getattr(request.state, "revoked_jtis", {}).get(token_data["jti"])
+        if revoked is not None:
+            return revoked
+        try:
+            return await token_revoked(token_data)
+        except RedisError as e:
+            if Config.REDIS_BLOCKLIST_FAILURE_POLICY == "allow":
+                logger.warning("Token blocklist unavailable, accepting token: %s", e)
+                return False
+            logger.warning("Token blocklist unavailable, rejecting request: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is temporarily unavailable, please retry",
+                headers={"Retry-After": str(math.ceil(Config.REDIS_BREAKER_RESET_TIMEOUT))},
+            )
+
     def token_valid(self, token: str) -> bool:
         """
         Validate the access token.
@@ -83,8 +115,12 @@ class RefreshTokenBearer(TokenBearer):
                 detail="Please provide a refresh token",
             )
         
+# one instance, so FastAPI decodes and checks the token once per request when
+# both get_current_user and RoleChecker depend on it
+access_token_bearer = AccessTokenBearer()
+
 async def get_current_user(
-    token_details: Annotated[dict, Depends(AccessTokenBearer())],
+    token_details: Annotated[dict, Depends(access_token_bearer)],
     session: Annotated[AsyncSession, Depends(get_session)]
 ):
     """
@@ -96,6 +132,8 @@ async def get_current_user(
     """
     user_email = token_details["user"]["email"]
     user = await user_service.get_user_by_email(user_email, session)
+    # don't hold a pool slot while the handler does non-database work
+    await release_connection(session)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -106,6 +144,9 @@ async def get_current_user(
 class RoleChecker:
     """
     Dependency to check if the user has the required role.
+    The role is read from the signed access token, so no database query is
+    made; a role change bumps the user's claims version, which revokes tokens
+    issued with the old role (see database/redis.py).
     Args:
         required_role (str): The required role for the endpoint.
     Returns:
@@ -114,13 +155,69 @@ class RoleChecker:
     def __init__(self, allowed_roles: list[str]):
         self.allowed_roles = allowed_roles
 
-    def __call__(self, user: Annotated[User, Depends(get_current_user)]):
-        if user.role not in self.allowed_roles:
+    def __call__(self, token_details: Annotated[dict, Depends(access_token_bearer)]):
+        if token_details["user"].get("role") not in self.allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You do not have permission to access this resource",
             )
         return True
+
+
+class RateLimiter:
+    """
+    Dependency that applies a token bucket rate limit to an endpoint.
+    Authenticated callers are limited per user, anonymous callers per IP.
+    Args:
+        scope (str): The bucket namespace, usually one per route.
+        rate (float): The refill rate in requests per second.
+        capacity (int): The burst size.
+        role_limits (dict[str, tuple[float, int]], optional): Per-role (rate, capacity)
+            overrides, keyed by the roles used with RoleChecker.
+    """
+    def __init__(self, scope: str, rate: float, capacity: int, role_limits: dict[str, tuple[float, int]] | None = None):
+        self.scope = scope
+        self.rate = rate
+        self.capacity = capacity
+        self.role_limits = role_limits or {}
+
+    async def __call__(self, request: Request):
+        if not Config.RATE_LIMIT_ENABLED:
+            return
+
+        identity, role, token_data = self.identify(request)
+        rate, capacity = self.role_limits.get(role, (self.rate, self.capacity))
+        # the blocklist lookup rides along in the same pipeline; TokenBearer
+        # reads the answer from request.state instead of asking Redis again
+        allowed, retry_after, revoked = await consume_rate_limit_token(
+            f"rate:{self.scope}:{identity}", rate, capacity, token_data
+        )
+        if revoked is not None:
+            request.state.revoked_jtis = {token_data["jti"]: revoked}
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please try again later",
+                headers={"Retry-After": str(max(retry_after, 1))},
+            )
+
+    def identify(self, request: Request) -> tuple[str, str | None, dict | None]:
+        """
+        Resolve the bucket identity, role and token of the caller without a database lookup.
+        Args:
+            request (Request): The incoming request.
+        Returns:
+            tuple[str, str | None, dict | None]: The identity ("user:<uid>" or "ip:<address>"),
+            the role claim and the decoded token.
+        """
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            token_data = decode_token(token)
+            if token_data and "uid" in token_data.get("user", {}):
+                user = token_data["user"]
+                return f"user:{user['uid']}", user.get("role"), token_data
+        host = request.client.host if request.client else "unknown"
+        return f"ip:{host}", None, None
     
 
 # from fastapi import Request, Depends, status
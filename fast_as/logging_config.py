@@ -0,0 +1,106 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from database.db_config import Config
+
+# pass as `extra=` to mark a record as high volume, so it is sampled below WARNING
+HIGH_VOLUME = {"high_volume": True}
+
+# loggers whose records are always treated as high volume
+HIGH_VOLUME_LOGGERS = ("sqlalchemy.engine",)
+
+# attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "high_volume"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including `extra=` fields."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of high-volume records below WARNING.
+    Args:
+        rate (float): The fraction of records to keep, between 0 and 1.
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        if getattr(record, "high_volume", False) or record.name.startswith(HIGH_VOLUME_LOGGERS):
+            return random.random() < self.rate
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records without formatting them.
+    The stock QueueHandler renders the message in the calling thread; here the
+    record is passed through untouched and formatted on the listener thread.
+    Log arguments should therefore not be mutated after the call.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging() -> None:
+    """
+    Route all logging through a queue drained by a background thread.
+    Safe to call more than once; only the first call configures logging.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(Config.LOG_SAMPLE_RATE))
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if Config.LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(Config.LOG_LEVEL)
+
+    # SQL echo goes through the same queue instead of SQLAlchemy's own stream handler
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if Config.DB_ECHO else logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background logging thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,23 +1,73 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from routes.book_route import book_router
 from routes.user_route import auth_router
 from routes.review_route import review_router
 from routes.tag_route import tag_router
+from routes.admin_route import admin_router
+from routes.health_route import health_router
+from routes.autocomplete_route import autocomplete_router
+from database.db_config import Config
+from database.connection import engine
+from database.redis import close_redis_clients
+from database.autocomplete import run_autocomplete_sync
+from startup import warm_up, load_autocomplete_terms
+from logging_config import setup_logging, shutdown_logging
+from middleware.compression import CompressionMiddleware
+from middleware.profiling import ProfilingMiddleware
+from middleware.request_context import RequestContextMiddleware
+from middleware.tracing import TracingMiddleware
+from tracing import shutdown_tracing
 
+setup_logging()
 
-# @asynccontextmanager
-# async def lifespan(app:FastAPI):
-#     print("Starting up...")
-#     await init_db()
-#     yield
-#     print("Shutting down...")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # serve liveness probes right away; /health/ready flips once warm-up is done
+    app.state.ready = False
+    warm_up_task = asyncio.create_task(warm_up(app))
+    # autocomplete answers empty until its index is loaded, so it does not delay readiness
+    stop_sync = asyncio.Event()
+    autocomplete_task = asyncio.create_task(run_autocomplete_sync(load_autocomplete_terms, stop_sync))
+    yield
+    stop_sync.set()
+    for task in (warm_up_task, autocomplete_task):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    # in-flight requests have finished; close pooled connections cleanly
+    await engine.dispose()
+    await close_redis_clients()
+    shutdown_tracing()
+    shutdown_logging()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestContextMiddleware)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=Config.COMPRESSION_MINIMUM_SIZE,
+    thread_threshold=Config.COMPRESSION_THREAD_THRESHOLD,
+)
+if Config.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware, sample_rate=Config.TRACE_SAMPLE_RATE)
+# outermost, so profiles include compression
+app.add_middleware(
+    ProfilingMiddleware,
+    directory=Config.PROFILE_DIR,
+    sample_rate=Config.PROFILE_SAMPLE_RATE,
+    interval=Config.PROFILE_INTERVAL,
+    max_files=Config.PROFILE_MAX_FILES,
+)
 
 app.include_router(book_router, prefix="/books", tags=["books"])
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(review_router, prefix="/reviews", tags=["reviews"])
 app.include_router(tag_router, prefix="/tags", tags=["tags"])
+app.include_router(admin_router, prefix="/admin", tags=["admin"])
+app.include_router(health_router, prefix="/health", tags=["health"])
+app.include_router(autocomplete_router, prefix="/autocomplete", tags=["autocomplete"])
 
 @app.get("/")
 async def root():
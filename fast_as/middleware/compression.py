@@ -0,0 +1,181 @@
+import gzip
+import zlib
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+# server preference, best ratio/speed first; only encodings whose library is installed
+SUPPORTED_ENCODINGS = tuple(
+    encoding for encoding, available in (("zstd", zstandard), ("br", brotli), ("gzip", True)) if available
+)
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """
+    Choose a content encoding from an Accept-Encoding header.
+    Args:
+        accept_encoding (str): The Accept-Encoding request header.
+    Returns:
+        str | None: The best supported encoding the client accepts, or None.
+    """
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """
+    Compress a complete body.
+    Args:
+        body (bytes): The uncompressed body.
+        encoding (str): One of SUPPORTED_ENCODINGS.
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+async def compress_body_async(body: bytes, encoding: str, thread_threshold: int) -> bytes:
+    """
+    Compress a body, off the event loop when it is at least `thread_threshold` bytes.
+    """
+    if len(body) >= thread_threshold:
+        return await run_in_threadpool(compress_body, body, encoding)
+    return compress_body(body, encoding)
+
+
+class _StreamCompressor:
+    """Incremental compressor for streamed responses."""
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk)
+        return self._compressor.compress(chunk)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best encoding the client accepts.
+    Bodies below `minimum_size`, non-textual content types and responses that
+    already carry a Content-Encoding (e.g. pre-compressed cache hits) are sent
+    as is. Bodies of at least `thread_threshold` bytes are compressed in the
+    thread pool so the event loop keeps serving other requests.
+    """
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, thread_threshold: int = 64 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+        passthrough = False
+        stream: _StreamCompressor | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough, stream
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    body = await compress_body_async(body, encoding, self.thread_threshold)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                # streamed response: compress chunk by chunk
+                del headers["Content-Length"]
+                stream = _StreamCompressor(encoding)
+                await send(start_message)
+                start_message = None
+
+            chunk = stream.compress(body)
+            if not more_body:
+                chunk += stream.flush()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,196 @@
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from fastapi.concurrency import run_in_threadpool
+from redis.exceptions import RedisError
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from database.redis import token_revoked
+from utils import decode_token
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    Profiler = SpeedscopeRenderer = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+# profile files: speedscope JSON from pyinstrument, folded stacks from the
+# built-in sampler; speedscope.app and flamegraph.pl open both
+PROFILE_SUFFIXES = (".speedscope.json", ".folded")
+
+_NAME_UNSAFE = re.compile(r"[^A-Za-z0-9]+")
+
+def _profile_name(scope: Scope) -> str:
+    path = _NAME_UNSAFE.sub("_", scope["path"]).strip("_")[:60] or "root"
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{scope['method']}-{path}-{uuid.uuid4().hex[:8]}"
+
+async def _admin_requested(headers: Headers) -> bool:
+    """
+    Whether the request asks for a profile and carries a valid, unrevoked
+    admin access token. While Redis is unavailable nobody gets a profile.
+    """
+    if headers.get(PROFILE_HEADER) != "1":
+        return False
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    token_data = decode_token(token)
+    if not token_data or token_data.get("refresh") or token_data["user"].get("role") != "admin":
+        return False
+    try:
+        return not await token_revoked(token_data)
+    except RedisError as e:
+        logger.warning("Not profiling request, the token blocklist is unavailable: %s", e)
+        return False
+
+
+class StackSampler:
+    """
+    Samples the stacks of every thread from a background thread while at least
+    one session is open; used when pyinstrument is not installed.
+    Samples are shared: a session also sees requests running concurrently with
+    it, and the thread pool (bcrypt, large compressions) shows up under its
+    thread names. Threads idle in a wait or a select are skipped.
+    """
+    IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._sessions: list[Counter] = []
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start_session(self) -> Counter:
+        stacks: Counter = Counter()
+        with self._lock:
+            self._sessions.append(stacks)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        return stacks
+
+    def stop_session(self, stacks: Counter) -> Counter:
+        with self._lock:
+            self._sessions.remove(stacks)
+        return stacks
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                sessions = list(self._sessions)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_filename.endswith(self.IDLE_FILES):
+                    continue
+                stack = self._fold(frame, names.get(ident, str(ident)))
+                for stacks in sessions:
+                    stacks[stack] += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _fold(frame, thread_name: str) -> str:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ";".join(reversed(frames))
+
+
+class ProfilingMiddleware:
+    """
+    Profile selected requests and store the result in `directory`.
+    A request is profiled if it sends "X-Profile: 1" with an admin access
+    token, or at random with probability `sample_rate`. The response carries
+    the file name in X-Profile-Id; list and download profiles under /admin/profiles.
+    pyinstrument, if installed, profiles the request's own task; otherwise a
+    StackSampler samples all threads for the duration of the request.
+    All workers write to the same directory, so any worker can list and serve
+    every profile; after each write the newest `max_files` across all workers
+    are kept.
+    """
+    def __init__(self, app: ASGIApp, directory: str, sample_rate: float = 0.0,
+                 interval: float = 0.001, max_files: int = 200):
+        self.app = app
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_files = max_files
+        self._sampler = StackSampler(interval) if Profiler is None else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not await self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        name = _profile_name(scope)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = name + self._suffix()
+            await send(message)
+
+        if Profiler is not None:
+            profiler = Profiler(interval=self.interval, async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                profiler.stop()
+                await run_in_threadpool(self._save, name, profiler.output(renderer=SpeedscopeRenderer()))
+        else:
+            stacks = self._sampler.start_session()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                self._sampler.stop_session(stacks)
+                folded = "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+                await run_in_threadpool(self._save, name, folded)
+
+    async def _selected(self, scope: Scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return await _admin_requested(Headers(scope=scope))
+
+    def _suffix(self) -> str:
+        return PROFILE_SUFFIXES[0] if Profiler is not None else PROFILE_SUFFIXES[1]
+
+    def _save(self, name: str, content: str) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / (name + self._suffix())).write_text(content)
+            for path in list_profiles(self.directory)[self.max_files:]:
+                path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning("Saving profile %s failed: %s", name, e)
+
+
+def list_profiles(directory: str | Path) -> list[Path]:
+    """
+    The stored profiles, newest first.
+    Args:
+        directory (str | Path): The profile directory.
+    Returns:
+        list[Path]: The profile files; empty if the directory does not exist.
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    paths = [path for path in directory.iterdir() if path.name.endswith(PROFILE_SUFFIXES)]
+    return sorted(paths, key=lambda path: path.name, reverse=True)
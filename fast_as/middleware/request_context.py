@@ -0,0 +1,22 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+from database.slow_query import request_scope
+
+
+class RequestContextMiddleware:
+    """
+    Expose the scope of the request being served through the `request_scope`
+    context variable, so code below the route handlers (e.g. the slow-query
+    log's cursor hooks) can tell which route it runs for.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
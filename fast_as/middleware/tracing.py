@@ -0,0 +1,58 @@
+import random
+import re
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from tracing import start_trace
+
+# W3C trace context: version-trace_id-parent_id-flags
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+SAMPLED_FLAG = 0x01
+
+
+class TracingMiddleware:
+    """
+    Start a trace for each sampled request; the spans recorded below it
+    (pool checkouts, statements, Redis calls, JWT decoding, password hashing)
+    become its children and the trace is exported when the response is done.
+    An incoming W3C `traceparent` header is continued along with its sampling
+    decision; otherwise a request is sampled with probability `sample_rate`.
+    The response carries the trace's `traceparent`.
+    """
+    def __init__(self, app: ASGIApp, sample_rate: float = 1.0):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = parent_id = None
+        match = _TRACEPARENT.match(Headers(scope=scope).get("traceparent", ""))
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            sampled = bool(int(flags, 16) & SAMPLED_FLAG)
+        else:
+            sampled = random.random() < self.sample_rate
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        with start_trace(f"{scope['method']} {scope['path']}", trace_id, parent_id) as root:
+            root.set_attribute("http.method", scope["method"])
+
+            async def send_with_traceparent(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    root.set_attribute("http.status_code", message["status"])
+                    MutableHeaders(scope=message)["traceparent"] = f"00-{root.trace.trace_id}-{root.span_id}-01"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_traceparent)
+            finally:
+                # the router adds the matched route to the scope; name the
+                # span after its template so traces of one endpoint group
+                route = getattr(scope.get("route"), "path", None)
+                if route is not None:
+                    root.name = f"{scope['method']} {route}"
+                    root.set_attribute("http.route", route)
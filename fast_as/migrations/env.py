@@ -11,6 +11,7 @@ from models.user_model import User
 from models.reviews_model import Review
 from models.tags_model import Tag
 from models.book_tag_model import BookTag
+from models.outbox_model import OutboxEvent
 from database.db_config import Config
 
 from alembic import context
@@ -0,0 +1,42 @@
+"""add outbox table
+
+Revision ID: 5c1f2e7a9b3d
+Revises: aa68b64272fa
+Create Date: 2026-10-19 09:12:41.203518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1f2e7a9b3d'
+down_revision: Union[str, None] = 'aa68b64272fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('outboxevent',
+    sa.Column('uid', sa.Uuid(), nullable=False),
+    sa.Column('event_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('aggregate_uid', sa.Uuid(), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('uid')
+    )
+    op.create_index('ix_outboxevent_pending', 'outboxevent', ['available_at'], unique=False, postgresql_where=sa.text('processed_at IS NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_outboxevent_pending', table_name='outboxevent', postgresql_where=sa.text('processed_at IS NULL'))
+    op.drop_table('outboxevent')
@@ -0,0 +1,39 @@
+"""cascade book deletes
+
+Revision ID: c4f1a8e2d6b9
+Revises: 9a3c5e1d7b24
+Create Date: 2026-10-19 16:02:11.540318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f1a8e2d6b9'
+down_revision: Union[str, None] = '9a3c5e1d7b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # reviews and tag links go with their book; batched review deletes look
+    # reviews up by book
+    op.create_index(op.f('ix_review_book_uid'), 'review', ['book_uid'], unique=False)
+    op.drop_constraint('review_book_uid_fkey', 'review', type_='foreignkey')
+    op.create_foreign_key('review_book_uid_fkey', 'review', 'book', ['book_uid'], ['uid'], ondelete='CASCADE')
+    op.drop_constraint('booktag_book_uid_fkey', 'booktag', type_='foreignkey')
+    op.create_foreign_key('booktag_book_uid_fkey', 'booktag', 'book', ['book_uid'], ['uid'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('booktag_book_uid_fkey', 'booktag', type_='foreignkey')
+    op.create_foreign_key('booktag_book_uid_fkey', 'booktag', 'book', ['book_uid'], ['uid'])
+    op.drop_constraint('review_book_uid_fkey', 'review', type_='foreignkey')
+    op.create_foreign_key('review_book_uid_fkey', 'review', 'book', ['book_uid'], ['uid'])
+    op.drop_index(op.f('ix_review_book_uid'), table_name='review')
@@ -0,0 +1,29 @@
+"""add user claims version
+
+Revision ID: e7b2d9c4a1f3
+Revises: c4f1a8e2d6b9
+Create Date: 2026-10-19 18:24:37.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2d9c4a1f3'
+down_revision: Union[str, None] = 'c4f1a8e2d6b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('claims_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user', 'claims_version')
@@ -0,0 +1,10 @@
+from sqlmodel import SQLModel
+from typing import Literal, Optional
+import uuid
+
+class Suggestion(SQLModel):
+    """Output model for an autocomplete suggestion."""
+    text: str
+    kind: Literal["title", "author", "tag"]
+    # the book of a title or the tag; authors have none
+    uid: Optional[uuid.UUID] = None
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from datetime import datetime
 from typing import Optional, List
 import uuid
@@ -8,15 +9,18 @@ from models.tags_model import TagRead
 
 class BookBase(SQLModel):
     title: str
-    author: str
-    publisher: str
+    # facet fields, indexed for filtering and grouped counts
+    author: str = Field(index=True)
+    publisher: str = Field(index=True)
     published_date: str
     page_count: int
-    language: str
+    language: str = Field(index=True)
 
 
 class Book(BookBase, table=True):
     """Database model for a Book."""
+    # keyset pages of a user's books, newest first
+    __table_args__ = (Index("ix_book_user_uid_created_at", "user_uid", "created_at", "uid"),)
     uid: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True, index=True)
     user_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="user.uid")
     created_at: datetime | None = Field(default_factory=datetime.now)
@@ -25,8 +29,8 @@ class Book(BookBase, table=True):
     # Relationship: Many-to-One (Book → User)
     user: Optional["User"] = Relationship(back_populates="books")
 
-    # Relationship: One-to-Many (Book → Review)
-    reviews: List["Review"] = Relationship(back_populates="book")
+    # Relationship: One-to-Many (Book → Review); the database deletes them with the book
+    reviews: List["Review"] = Relationship(back_populates="book", passive_deletes=True)
 
     tags: List["Tag"] = Relationship(
         link_model=BookTag,
@@ -53,6 +57,47 @@ class BookReadWithReviewsAndTags(BookReadWithReviews):
     """Output model for reading a book."""
     tags: List[TagRead]
 
+class BookReadTrending(BookBase):
+    """Output model for a trending book and its decayed activity score."""
+    uid: uuid.UUID
+    user_uid: uuid.UUID | None = None
+    created_at: datetime
+    updated_at: datetime
+    trending_score: float
+
+class BookReadSimilar(BookBase):
+    """Output model for a similar book and its tag similarity."""
+    uid: uuid.UUID
+    user_uid: uuid.UUID | None = None
+    created_at: datetime
+    updated_at: datetime
+    similarity: float
+
+class BookBulkDelete(SQLModel):
+    """Input model for deleting many books, e.g. from a cleanup job."""
+    book_uids: List[uuid.UUID] = Field(..., min_length=1, max_length=1000)
+
+class BookBulkDeleteResult(SQLModel):
+    """Books scheduled for deletion and UIDs that matched no book."""
+    scheduled: List[uuid.UUID]
+    not_found: List[uuid.UUID]
+
+class BookFilters(SQLModel):
+    """Facet filters for listing books; values of one field are OR-ed, fields are AND-ed."""
+    author: Optional[List[str]] = None
+    publisher: Optional[List[str]] = None
+    language: Optional[List[str]] = None
+
+class FacetCount(SQLModel):
+    value: str
+    count: int
+
+class BookFacets(SQLModel):
+    """Number of books per facet value, most common first."""
+    author: List[FacetCount]
+    publisher: List[FacetCount]
+    language: List[FacetCount]
+
 class BookUpdate(SQLModel):
     """Input model for updating a book."""
     title: Optional[str] = None
@@ -5,5 +5,5 @@ import uuid
 
 class BookTag(SQLModel, table=True):
     """Database model for a Book-Tag association."""
-    book_uid: uuid.UUID = Field(foreign_key="book.uid", primary_key=True)
+    book_uid: uuid.UUID = Field(foreign_key="book.uid", primary_key=True, ondelete="CASCADE")
     tag_uid: uuid.UUID = Field(foreign_key="tag.uid", primary_key=True)
\ No newline at end of file
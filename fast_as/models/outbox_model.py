@@ -0,0 +1,25 @@
+from sqlmodel import SQLModel, Field, Column, JSON
+from sqlalchemy import Index, text
+from datetime import datetime
+from typing import Optional
+import uuid
+
+class OutboxEvent(SQLModel, table=True):
+    """Database model for a side effect recorded in the same transaction as a write."""
+    __table_args__ = (
+        Index(
+            "ix_outboxevent_pending",
+            "available_at",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+    )
+
+    uid: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    event_type: str
+    aggregate_uid: Optional[uuid.UUID] = Field(default=None)
+    payload: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.now)
+    available_at: datetime = Field(default_factory=datetime.now)
+    processed_at: Optional[datetime] = Field(default=None)
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from datetime import datetime
 import uuid
 from typing import Optional, List
@@ -10,6 +11,8 @@ class ReviewBase(SQLModel):
 
 class Review(ReviewBase, table=True):
     """Database model for a Review."""
+    # keyset pages of a user's reviews, newest first
+    __table_args__ = (Index("ix_review_user_uid_created_at", "user_uid", "created_at", "uid"),)
     uid: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True, index=True)
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now, sa_column_kwargs={"onupdate": datetime.now})
@@ -19,7 +22,7 @@ class Review(ReviewBase, table=True):
     user: "User" = Relationship(back_populates="reviews")
 
     # Relationship: Many-to-One (Review → Book)
-    book_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="book.uid")
+    book_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="book.uid", index=True, ondelete="CASCADE")
     book: "Book" = Relationship(back_populates="reviews")
 
 class ReviewCreate(ReviewBase):
@@ -42,3 +45,19 @@ class ReviewUpdate(SQLModel):
     content: Optional[str] = None
     rating: Optional[int] = None
 
+class ReviewBulkItem(ReviewCreate):
+    """Input model for a single review in a bulk ingestion request."""
+    book_uid: uuid.UUID
+
+class ReviewBulkCreate(SQLModel):
+    """Input model for ingesting many reviews across books."""
+    reviews: List[ReviewBulkItem] = Field(..., min_length=1, max_length=5000)
+
+class ReviewBulkResult(SQLModel):
+    """Per-item result of a bulk review ingestion."""
+    index: int
+    book_uid: uuid.UUID
+    status: str
+    review_uid: Optional[uuid.UUID] = None
+    detail: Optional[str] = None
+
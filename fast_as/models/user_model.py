@@ -1,7 +1,7 @@
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Literal, Optional, List
 import uuid
 # from enum import Enum 
 
@@ -21,6 +21,9 @@ class User(UserBase, table=True):
     """Database model for a User."""
     uid: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True, index=True)
     role: str = Field(default="user")
+    # bumped on every role change; access tokens carry the version they were
+    # issued with and older ones are rejected (see database/redis.py)
+    claims_version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     password_hashed: str = Field(nullable=False)
     is_verified: bool = Field(default=False)
     created_at: datetime | None = Field(default_factory=datetime.now)
@@ -58,6 +61,41 @@ class UserReadWithBooksAndReviews(UserBase):
     reviews: List[UserReadWithReviews] = []  # type: ignore
 
 
+class UserBookItem(BaseModel):
+    uid: uuid.UUID
+    title: str
+    created_at: datetime
+
+class UserReviewItem(BaseModel):
+    uid: uuid.UUID
+    book_uid: uuid.UUID | None = None
+    content: str
+    rating: int
+    created_at: datetime
+
+class UserBookPage(BaseModel):
+    """A page of the user's books, newest first; pass next_cursor to get the next page."""
+    items: List[UserBookItem]
+    next_cursor: Optional[str] = None
+
+class UserReviewPage(BaseModel):
+    """A page of the user's reviews, newest first; pass next_cursor to get the next page."""
+    items: List[UserReviewItem]
+    next_cursor: Optional[str] = None
+
+class UserProfile(UserRead):
+    """Output model for /auth/me: the profile, collection sizes and first pages."""
+    book_count: int
+    review_count: int
+    books: UserBookPage
+    reviews: UserReviewPage
+
+
+class UserRoleUpdate(BaseModel):
+    """Input model for changing a user's role."""
+    role: Literal["admin", "user"]
+
+
 class UserLogin(SQLModel):
     """Input model for logging in."""
     email: str
@@ -0,0 +1,164 @@
+import logging
+import uuid
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.exceptions import HTTPException
+from fastapi.responses import FileResponse
+from typing import Annotated
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database.connection import get_session, pool_occupancy, slow_query_log
+from database.redis import get_pool_stats, publish_claims_version
+from database.db_config import Config
+from dependencies import RoleChecker
+from middleware.profiling import list_profiles
+from models.book_model import BookBulkDelete, BookBulkDeleteResult
+from models.user_model import UserRoleUpdate
+from services.book_service import BookService
+from services.user_service import UserService
+from redis.exceptions import RedisError
+from utils import ACCESS_TOKEN_EXPIRY
+
+logger = logging.getLogger(__name__)
+
+admin_router = APIRouter()
+admin_role_checker = RoleChecker(['admin'])
+book_service = BookService()
+user_service = UserService()
+
+@admin_router.get("/pool", status_code=status.HTTP_200_OK)
+async def get_pool_occupancy(_: bool = Depends(admin_role_checker)) -> dict:
+    """
+    Get database pool occupancy since the last reset.
+    Returns:
+        dict: Current and peak checked-out connections, checkout count and hold times.
+    """
+    return pool_occupancy.snapshot()
+
+@admin_router.post("/pool/reset", status_code=status.HTTP_200_OK)
+async def reset_pool_occupancy(_: bool = Depends(admin_role_checker)) -> dict:
+    """
+    Reset the pool occupancy counters, e.g. before running a load mix.
+    Returns:
+        dict: The counters after the reset.
+    """
+    pool_occupancy.reset()
+    return pool_occupancy.snapshot()
+
+@admin_router.get("/slow_queries", status_code=status.HTTP_200_OK)
+async def get_slow_queries(
+    _: bool = Depends(admin_role_checker),
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    order_by: Annotated[str, Query(pattern="^(total|max|count)$")] = "total",
+) -> list[dict]:
+    """
+    Get the worst statements slower than SLOW_QUERY_THRESHOLD_MS seen by this worker.
+    Args:
+        limit (int): The number of statements.
+        order_by (str): "total" (summed duration), "max" or "count".
+    Returns:
+        list[dict]: Per statement: timings, originating routes, the parameters of
+        its slowest run and its EXPLAIN plan once captured.
+    """
+    return slow_query_log.worst(limit, order_by)
+
+@admin_router.post("/slow_queries/reset", status_code=status.HTTP_200_OK)
+async def reset_slow_queries(_: bool = Depends(admin_role_checker)) -> dict:
+    """
+    Clear the slow-query log and its captured plans, e.g. after adding an index.
+    Returns:
+        dict: A confirmation message.
+    """
+    slow_query_log.reset()
+    return {"message": "Slow-query log cleared"}
+
+@admin_router.get("/redis", status_code=status.HTTP_200_OK)
+async def get_redis_pools(_: bool = Depends(admin_role_checker)) -> dict:
+    """
+    Get the Redis connection pools of this worker and its circuit breaker state.
+    Returns:
+        dict: In-use and idle connections per pool, and the breaker state and failure count.
+    """
+    return get_pool_stats()
+
+@admin_router.post("/books/delete", response_model=BookBulkDeleteResult, status_code=status.HTTP_202_ACCEPTED)
+async def bulk_delete_books(
+    data: BookBulkDelete,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    _: bool = Depends(admin_role_checker),
+):
+    """
+    Delete many books with their reviews and tag links, e.g. from a cleanup job.
+    The worker deletes each book in bounded batches.
+    Args:
+        data (BookBulkDelete): The UIDs of the books to delete.
+    Returns:
+        BookBulkDeleteResult: The scheduled books and the UIDs that matched none.
+    """
+    return await book_service.schedule_book_purges_service(data.book_uids, session)
+
+@admin_router.patch("/users/{user_uid}/role", status_code=status.HTTP_200_OK)
+async def update_user_role(
+    user_uid: uuid.UUID,
+    data: UserRoleUpdate,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    _: bool = Depends(admin_role_checker),
+) -> dict:
+    """
+    Change a user's role. Their access tokens issued with the old role stop
+    working; a refresh or a new login issues one with the new role.
+    Args:
+        user_uid (uuid.UUID): The UID of the user.
+        data (UserRoleUpdate): The new role.
+    Returns:
+        dict: The new role and claims version.
+    """
+    claims_version = await user_service.update_role(user_uid, data.role, session)
+    try:
+        await publish_claims_version(str(user_uid), claims_version, ACCESS_TOKEN_EXPIRY)
+    except RedisError as e:
+        logger.error("Role of user %s changed but its tokens could not be revoked: %s", user_uid, e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The role was changed, but tokens issued with the old role are still valid; retry",
+        )
+    return {"role": data.role, "claims_version": claims_version}
+
+@admin_router.get("/profiles", status_code=status.HTTP_200_OK)
+async def get_profiles(_: bool = Depends(admin_role_checker)) -> list[dict]:
+    """
+    List the stored request profiles of all workers, newest first.
+    Returns:
+        list[dict]: The name, size in bytes and creation time of each profile.
+    """
+    profiles = []
+    for path in list_profiles(Config.PROFILE_DIR):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            # pruned by another worker since the directory was listed
+            continue
+        profiles.append({
+            "name": path.name,
+            "size": stat.st_size,
+            "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        })
+    return profiles
+
+@admin_router.get("/profiles/{name}", status_code=status.HTTP_200_OK)
+async def download_profile(name: str, _: bool = Depends(admin_role_checker)) -> FileResponse:
+    """
+    Download a stored profile; open it in speedscope.app or with flamegraph.pl.
+    Args:
+        name (str): The profile name, as listed or sent in X-Profile-Id.
+    Returns:
+        FileResponse: The profile file.
+    """
+    # only names from the listing, so the path can't leave the profile directory
+    path = next((path for path in list_profiles(Config.PROFILE_DIR) if path.name == name), None)
+    try:
+        stat = path.stat() if path is not None else None
+    except FileNotFoundError:
+        stat = None
+    if stat is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(path, filename=path.name, media_type="application/octet-stream", stat_result=stat)
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, Query, status
+from typing import Annotated, Literal
+from models.autocomplete_model import Suggestion
+from database.autocomplete import autocomplete_index
+from dependencies import AccessTokenBearer
+
+autocomplete_router = APIRouter()
+access_token_bearer = AccessTokenBearer()
+
+@autocomplete_router.get("", response_model=list[Suggestion], status_code=status.HTTP_200_OK)
+async def autocomplete(
+    token_details: Annotated[dict, Depends(access_token_bearer)],
+    prefix: Annotated[str, Query(min_length=1, max_length=100)],
+    kind: Annotated[Literal["title", "author", "tag"] | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=50)] = 10,
+) -> list[Suggestion]:
+    """
+    Suggest book titles, authors and tags starting with a prefix
+    Served from the in-process index without touching the database.
+    Args:
+        prefix (str): The typed text; matches the start of the first words, ignoring case.
+        kind (str, optional): Only suggest titles, authors or tags.
+        limit (int): The maximum number of suggestions.
+    Returns:
+        list[Suggestion]: The suggestions in alphabetical order of the matched text.
+    """
+    return [
+        Suggestion(kind=term_kind, text=text, uid=uid or None)
+        for term_kind, text, uid in autocomplete_index.search(prefix, limit, kind)
+    ]
@@ -1,29 +1,56 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request, Response, status
 from fastapi.exceptions import HTTPException
-from models.book_model import Book, BookCreate, BookUpdate, BookReadWithReviews, BookRead, BookReadWithReviewsAndTags
+from models.book_model import Book, BookCreate, BookUpdate, BookReadWithReviews, BookRead, BookReadWithReviewsAndTags, BookReadTrending, BookReadSimilar, BookFilters, BookFacets
 from models.user_model import User
 from services.book_service import BookService
-from database.connection import get_session
+from database.connection import get_session, release_connection, json_aggregation_enabled
 from typing import Annotated
+import uuid
 from sqlalchemy.ext.asyncio.session import AsyncSession
-from dependencies import AccessTokenBearer, get_current_user
+from dependencies import AccessTokenBearer, get_current_user, RateLimiter
+from database.response_cache import cached_json_response, book_surrogate_key, BOOKS_SURROGATE_KEY
+from database.trending import get_trending_book_uids, record_book_view
+from database.similar_books import get_similar_books
+from pydantic import TypeAdapter
 
 book_router = APIRouter()
 book_service = BookService()
 access_token_bearer = AccessTokenBearer()
+list_books_rate_limiter = RateLimiter("books:list", rate=5, capacity=20, role_limits={"admin": (50, 200)})
+book_list_adapter = TypeAdapter(list[BookReadWithReviews])
+
+def book_filters(
+    author: Annotated[list[str] | None, Query()] = None,
+    publisher: Annotated[list[str] | None, Query()] = None,
+    language: Annotated[list[str] | None, Query()] = None,
+) -> BookFilters:
+    """Facet filters from the query string; repeat a parameter to select several values."""
+    return BookFilters(author=author, publisher=publisher, language=language)
 
 #get all books
-@book_router.get("/", response_model=list[BookReadWithReviews], status_code=status.HTTP_200_OK)
+@book_router.get(
+    "/", response_model=list[BookReadWithReviews], status_code=status.HTTP_200_OK,
+    dependencies=[Depends(list_books_rate_limiter)],
+)
 async def get_all_books(
+    request: Request,
     session: Annotated[AsyncSession, Depends(get_session)],
     token_details: Annotated[dict, Depends(access_token_bearer)],
+    filters: Annotated[BookFilters, Depends(book_filters)],
 ):
     """
-    Get all books
+    Get all books matching the facet filters, served from the response cache when possible
     """
     # print(f"\n\n User details: {token_details}")
-    books = await book_service.get_all_books_service(session)
-    return books
+    async def load_books():
+        books = await book_service.get_all_books_service(session, filters)
+        await release_connection(session)
+        return books
+
+    return await cached_json_response(
+        request, book_list_adapter, load_books,
+        lambda books: [BOOKS_SURROGATE_KEY, *(book_surrogate_key(book.uid) for book in books)],
+    )
 
 @book_router.get("/user", response_model=list[BookRead], status_code=status.HTTP_200_OK)
 async def get_user_book_submissions(
@@ -42,13 +69,56 @@ async def get_user_book_submissions(
     
 
     books = await book_service.get_all_books_by_user(session, user_uid)
+    await release_connection(session)
     return books
 
+@book_router.get("/trending", response_model=list[BookReadTrending], status_code=status.HTTP_200_OK)
+async def get_trending_books(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    token_details: Annotated[dict, Depends(access_token_bearer)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """
+    Get the books with the most recent views and reviews
+    Args:
+        session (AsyncSession): The database session.
+        limit (int): The maximum number of books.
+    Returns:
+        list[BookReadTrending]: The books, highest trending score first.
+    """
+    ranked = await get_trending_book_uids(limit)
+    scores = dict(ranked)
+    books = await book_service.get_books_by_uids_service([uid for uid, _ in ranked], session)
+    await release_connection(session)
+    return [
+        BookReadTrending.model_validate(book, from_attributes=True, update={"trending_score": scores[str(book.uid)]})
+        for book in books
+    ]
+
+@book_router.get("/facets", response_model=BookFacets, status_code=status.HTTP_200_OK)
+async def get_book_facets(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    token_details: Annotated[dict, Depends(access_token_bearer)],
+    filters: Annotated[BookFilters, Depends(book_filters)],
+):
+    """
+    Get the number of books per author, publisher and language
+    Args:
+        session (AsyncSession): The database session.
+        filters (BookFilters): The same facet filters as GET /books/.
+    Returns:
+        BookFacets: The most common values of each facet with their counts.
+    """
+    facets = await book_service.get_facet_counts_service(session, filters)
+    await release_connection(session)
+    return facets
+
 #get book by uid
 @book_router.get("/{book_uid}", response_model=BookReadWithReviewsAndTags, status_code=status.HTTP_200_OK)
 async def get_book(
     book_uid: str, session: Annotated[AsyncSession, Depends(get_session)],
-    token_details: Annotated[dict, Depends(access_token_bearer)]
+    token_details: Annotated[dict, Depends(access_token_bearer)],
+    background_tasks: BackgroundTasks,
 ):
     """
     Get book by uid
@@ -58,9 +128,43 @@ async def get_book(
     Returns:
         Book: The book object.
     """
+    if json_aggregation_enabled():
+        document = await book_service.get_book_document_service(book_uid, session)
+        await release_connection(session)
+        # counted after the response is sent
+        background_tasks.add_task(record_book_view, uuid.UUID(book_uid))
+        return Response(content=document, media_type="application/json")
+
     book = await book_service.get_book_service(book_uid, session)
+    await release_connection(session)
+    background_tasks.add_task(record_book_view, book.uid)
     return book
 
+@book_router.get("/{book_uid}/similar", response_model=list[BookReadSimilar], status_code=status.HTTP_200_OK)
+async def get_similar_books_route(
+    book_uid: uuid.UUID,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    token_details: Annotated[dict, Depends(access_token_bearer)],
+    limit: Annotated[int, Query(ge=1, le=50)] = 10,
+):
+    """
+    Get the books whose tags are most similar to a book's
+    Args:
+        book_uid (UUID): The UID of the book.
+        session (AsyncSession): The database session.
+        limit (int): The maximum number of books.
+    Returns:
+        list[BookReadSimilar]: The books, most similar first.
+    """
+    neighbours = (await get_similar_books(book_uid))[:limit]
+    scores = dict(neighbours)
+    books = await book_service.get_books_by_uids_service([uid for uid, _ in neighbours], session)
+    await release_connection(session)
+    return [
+        BookReadSimilar.model_validate(book, from_attributes=True, update={"similarity": scores[str(book.uid)]})
+        for book in books
+    ]
+
 # create book
 @book_router.post("/", response_model=Book, status_code=status.HTTP_201_CREATED)
 async def create_book(
@@ -111,20 +215,24 @@ async def update_book(
 @book_router.delete("/{book_uid}")
 async def delete_book(
     book_uid: str,
+    response: Response,
     session: Annotated[AsyncSession, Depends(get_session)],
     user_details: Annotated[User, Depends(get_current_user)]
 )-> dict[str, str]:
     """
-    Delete a book by UID
+    Delete a book by UID; answers 202 when a book with many reviews is
+    deleted in the background
     Args:
         book_uid (str): The UID of the book to delete.
         session (AsyncSession): The database session.
     Returns:
-        dict[str, str]: A dictionary with a success message.
+        dict[str, str]: A dictionary with a message and a status, "deleted" or "scheduled".
     """
     user_uid = user_details.uid
     if not user_uid:
         raise HTTPException(status_code=400, detail="Invalid user details: missing user UID")
     
-    await book_service.delete_book_service(book_uid, session, user_uid)
-    return {"message": "Book deleted successfully"}
+    result = await book_service.delete_book_service(book_uid, session, user_uid)
+    if result["status"] == "scheduled":
+        response.status_code = status.HTTP_202_ACCEPTED
+    return result
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+
+health_router = APIRouter()
+
+@health_router.get("/live", status_code=status.HTTP_200_OK)
+async def live() -> dict:
+    """
+    Liveness probe; answers as soon as the worker serves requests.
+    Returns:
+        dict: {"status": "ok"}.
+    """
+    return {"status": "ok"}
+
+@health_router.get("/ready")
+async def ready(request: Request) -> JSONResponse:
+    """
+    Readiness probe; 503 until warm-up has filled the pools (see startup.py).
+    Returns:
+        JSONResponse: {"status": "ready"} with 200, or {"status": "warming"} with 503.
+    """
+    if getattr(request.app.state, "ready", False):
+        return JSONResponse({"status": "ready"}, status_code=status.HTTP_200_OK)
+    return JSONResponse({"status": "warming"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -2,11 +2,11 @@ from fastapi import APIRouter, Depends, status
 from fastapi.exceptions import HTTPException
 from typing import Annotated
 from sqlalchemy.ext.asyncio.session import AsyncSession
-from models.reviews_model import Review, ReviewCreate, ReviewUpdate
+from models.reviews_model import Review, ReviewCreate, ReviewUpdate, ReviewBulkCreate, ReviewBulkResult
 from models.user_model import User
 from models.book_model import Book
 from services.review_service import ReviewService
-from database.connection import get_session
+from database.connection import get_session, release_connection
 from dependencies import get_current_user, AccessTokenBearer
 
 review_router = APIRouter()
@@ -14,6 +14,29 @@ review_service = ReviewService()
 access_token_bearer = AccessTokenBearer()
 # access_token_bearer = AccessTokenBearer()
 
+@review_router.post("/bulk", response_model=list[ReviewBulkResult], status_code=status.HTTP_200_OK)
+async def add_reviews_bulk(
+    bulk_data: ReviewBulkCreate,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    user_details: Annotated[User, Depends(get_current_user)],
+):
+    """
+    Add many reviews across books in one request.
+
+    Args:
+        bulk_data (ReviewBulkCreate): The reviews to add, each with its book UID.
+        session (AsyncSession): The database session.
+        user_details (User): The current user details.
+
+    Returns:
+        list[ReviewBulkResult]: One result per submitted review, in input order.
+    """
+    user_uid = user_details.uid
+    if not user_uid:
+        raise HTTPException(status_code=400, detail="Invalid user details: missing user UID")
+
+    return await review_service.add_reviews_bulk_service(session, bulk_data.reviews, user_uid)
+
 @review_router.post("/{book_uid}", response_model=Review, status_code=status.HTTP_201_CREATED)
 async def add_review(
     book_uid: str,
@@ -57,7 +80,9 @@ async def get_review(
     Returns:
         Review: The review object.
     """
-    return await review_service.get_review_service(session, review_uid)
+    review = await review_service.get_review_service(session, review_uid)
+    await release_connection(session)
+    return review
 
 @review_router.patch("/{review_uid}", response_model=Review, status_code=status.HTTP_200_OK)
 async def update_review(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
 from fastapi.exceptions import HTTPException
 from typing import Annotated
 from sqlalchemy.ext.asyncio.session import AsyncSession
@@ -6,24 +6,37 @@ from models.tags_model import Tag, TagCreate, TagRead, TagUpdate
 from models.book_model import BookReadWithReviews, Book
 from models.user_model import User
 from services.tag_service import TagService
-from database.connection import get_session
+from database.connection import get_session, release_connection
 from dependencies import get_current_user, AccessTokenBearer
+from database.response_cache import (
+    cached_json_response, book_surrogate_key, tag_surrogate_key, TAGS_SURROGATE_KEY
+)
+from pydantic import TypeAdapter
 
 tag_router = APIRouter()
 tag_service = TagService()
 access_token_bearer = AccessTokenBearer()
+tag_list_adapter = TypeAdapter(list[TagRead])
+book_list_adapter = TypeAdapter(list[BookReadWithReviews])
 
 # get all tags
 @tag_router.get("/", response_model=list[TagRead], status_code=status.HTTP_200_OK)
 async def get_all_tags(
+    request: Request,
     session: Annotated[AsyncSession, Depends(get_session)],
     token_details: Annotated[dict, Depends(access_token_bearer)],
 ): 
     """
-    Get all tags
+    Get all tags, served from the response cache when possible
     """
-    tags = await tag_service.get_all_tags_service(session)
-    return tags
+    async def load_tags():
+        tags = await tag_service.get_all_tags_service(session)
+        await release_connection(session)
+        return tags
+
+    return await cached_json_response(
+        request, tag_list_adapter, load_tags, lambda tags: [TAGS_SURROGATE_KEY]
+    )
 
 @tag_router.get("/{tag_uid}", response_model=TagRead, status_code=status.HTTP_200_OK)
 async def get_tag(
@@ -40,24 +53,33 @@ async def get_tag(
         Tag: The tag object.
     """
     tag = await tag_service.get_tag_service(tag_uid, session)
+    await release_connection(session)
     return tag
 
 @tag_router.get("/{tag_uid}/books", response_model=list[BookReadWithReviews], status_code=status.HTTP_200_OK)
 async def get_books_by_tag(
     tag_uid: str,
+    request: Request,
     session: Annotated[AsyncSession, Depends(get_session)],
     token_details: Annotated[dict, Depends(access_token_bearer)],
 ):
     """
-    Get all books associated with a specific tag by UID
+    Get all books associated with a specific tag by UID, served from the response cache when possible
     Args:
         tag_uid (str): The UID of the tag.
         session (AsyncSession): The database session.
     Returns:
         List[Book]: A list of book objects associated with the tag.
     """
-    books = await tag_service.get_books_by_tag_service(tag_uid, session)
-    return books
+    async def load_books():
+        books = await tag_service.get_books_by_tag_service(tag_uid, session)
+        await release_connection(session)
+        return books
+
+    return await cached_json_response(
+        request, book_list_adapter, load_books,
+        lambda books: [tag_surrogate_key(tag_uid), *(book_surrogate_key(book.uid) for book in books)],
+    )
 
 @tag_router.post("/{book_uid}/tags", response_model=Book, status_code=status.HTTP_200_OK)
 async def add_tags_to_book(
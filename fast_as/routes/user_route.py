@@ -1,21 +1,26 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from fastapi.exceptions import HTTPException
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import Annotated
+import logging
 from datetime import timedelta, datetime
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlmodel import select, desc
-from sqlalchemy.orm import selectinload
-from models.user_model import User, UserCreate, UserRead, UserLogin, UserReadWithBooksAndReviews
-from database.connection import get_session
+from models.user_model import User, UserCreate, UserRead, UserLogin, UserProfile, UserBookPage, UserReviewPage
+from database.connection import get_session, release_connection
 from services.user_service import UserService
-from utils import verify_pswd_hash, create_access_token
-from dependencies import RefreshTokenBearer, AccessTokenBearer, get_current_user, RoleChecker
-from database.redis import add_jti_to_blocklist
+from utils import verify_and_update_pswd_hash, create_access_token, REFRESH_TOKEN_EXPIRY
+from dependencies import RefreshTokenBearer, AccessTokenBearer, get_current_user, RoleChecker, RateLimiter
+from database.redis import add_jti_to_blocklist, revoke_user_tokens
+
+logger = logging.getLogger(__name__)
 
 auth_router = APIRouter()
 user_service = UserService()
 role_checker = RoleChecker(['admin', 'user'])
+# every attempt costs a bcrypt verification, so allow small bursts only
+login_rate_limiter = RateLimiter("auth:login", rate=0.2, capacity=5)
+access_token_bearer = AccessTokenBearer()
 
 @auth_router.post("/signup", response_model=UserRead, status_code=status.HTTP_201_CREATED)
 async def create_user_account(
@@ -41,7 +46,7 @@ async def create_user_account(
     return new_user
     
 
-@auth_router.post("/login", status_code=status.HTTP_200_OK)
+@auth_router.post("/login", status_code=status.HTTP_200_OK, dependencies=[Depends(login_rate_limiter)])
 async def login_user(user_data: UserLogin, session: Annotated[AsyncSession, Depends(get_session)]):
     """
     Log in a user
@@ -54,20 +59,32 @@ async def login_user(user_data: UserLogin, session: Annotated[AsyncSession, Depe
     email = user_data.email
     # Check if the user exists
     exist_user = await user_service.user_exists(email, session)
+    # release the connection before the slow bcrypt check
+    await release_connection(session)
     
     if exist_user is not None:
-        # Verify the password
-        password_valid = verify_pswd_hash(user_data.password, exist_user.password_hashed)
+        # Verify the password off the event loop; bcrypt is CPU bound
+        password_valid, new_hash = await run_in_threadpool(
+            verify_and_update_pswd_hash, user_data.password, exist_user.password_hashed
+        )
         if password_valid:
+            if new_hash is not None:
+                # the stored hash uses an outdated cost, upgrade it transparently
+                try:
+                    await user_service.update_password_hash(exist_user, new_hash, session)
+                except Exception:
+                    await session.rollback()
+                    logger.exception("Failed to rehash password for user %s", exist_user.uid)
             access_token = create_access_token(
-                user_data={"email": exist_user.email, 
-                "uid": str(exist_user.uid), "role": exist_user.role},
+                user_data={"email": exist_user.email,
+                "uid": str(exist_user.uid), "role": exist_user.role,
+                "claims_version": exist_user.claims_version},
             )
 
             refrest_token = create_access_token(
                 user_data={"email": exist_user.email, "uid": str(exist_user.uid)},
                 refresh=True,
-                expiry=timedelta(days=7),
+                expiry=timedelta(seconds=REFRESH_TOKEN_EXPIRY),
             )
 
             return JSONResponse(
@@ -84,7 +101,10 @@ async def login_user(user_data: UserLogin, session: Annotated[AsyncSession, Depe
     )
 
 @auth_router.get("/refresh_token")
-async def get_new_access_token(token_detials: Annotated[dict, Depends(RefreshTokenBearer())]):
+async def get_new_access_token(
+    token_detials: Annotated[dict, Depends(RefreshTokenBearer())],
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
     """
     Get a new access token using the refresh token
     Args:
@@ -93,9 +113,20 @@ async def get_new_access_token(token_detials: Annotated[dict, Depends(RefreshTok
         JSONResponse: The new access token.
     """
     expiry_timestamp = token_detials["exp"]
-    print(f"\n\n TOKEN DETAILS:\n\n {token_detials}\n")
     if datetime.fromtimestamp(expiry_timestamp) > datetime.now():
-        new_access_token = create_access_token(user_data=token_detials["user"])
+        # the role and claims version come from the database, not the refresh
+        # token, so a new access token reflects the latest role change
+        user = await user_service.get_user_by_uid(token_detials["user"]["uid"], session)
+        await release_connection(session)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+        new_access_token = create_access_token(
+            user_data={"email": user.email, "uid": str(user.uid), "role": user.role,
+            "claims_version": user.claims_version},
+        )
 
         return JSONResponse(
             content={"message": "New access token generated", "access_token": new_access_token}
@@ -118,25 +149,55 @@ async def get_new_access_token(token_detials: Annotated[dict, Depends(RefreshTok
 #     """
 #     return current_user
 
-@auth_router.get("/me", response_model=UserReadWithBooksAndReviews, status_code=status.HTTP_200_OK)
+@auth_router.get("/me", response_model=UserProfile, status_code=status.HTTP_200_OK)
 async def get_current_user_details(
     current_user: Annotated[User, Depends(get_current_user)],
     _: bool = Depends(role_checker),
     session: AsyncSession = Depends(get_session),
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
 ):
     """
-    Get the details of the currently logged-in user, including their books and reviews.
+    Get the details of the currently logged-in user, the number of their books
+    and reviews, and the first page of each; use next_cursor with /me/books
+    and /me/reviews for the rest.
     """
-    result = await session.exec(
-        select(User)
-        .where(User.uid == current_user.uid)
-        .options(
-            selectinload(User.books),
-            selectinload(User.reviews)
-        )
-    )
-    user = result.first()
-    return user
+    profile = await user_service.get_profile(current_user, session, limit)
+    await release_connection(session)
+    return profile
+
+@auth_router.get("/me/books", response_model=UserBookPage, status_code=status.HTTP_200_OK)
+async def get_current_user_books(
+    token_details: Annotated[dict, Depends(access_token_bearer)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    cursor: Annotated[str | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """
+    Get a page of the current user's books, newest first
+    Args:
+        cursor (str, optional): The next_cursor of the previous page.
+        limit (int): The page size.
+    """
+    page = await user_service.get_books_page(token_details["user"]["uid"], session, limit, cursor)
+    await release_connection(session)
+    return page
+
+@auth_router.get("/me/reviews", response_model=UserReviewPage, status_code=status.HTTP_200_OK)
+async def get_current_user_reviews(
+    token_details: Annotated[dict, Depends(access_token_bearer)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    cursor: Annotated[str | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """
+    Get a page of the current user's reviews, newest first
+    Args:
+        cursor (str, optional): The next_cursor of the previous page.
+        limit (int): The page size.
+    """
+    page = await user_service.get_reviews_page(token_details["user"]["uid"], session, limit, cursor)
+    await release_connection(session)
+    return page
 
 @auth_router.post("/logout")
 async def logout_user(token_detials: Annotated[dict, Depends(AccessTokenBearer())]):
@@ -150,6 +211,18 @@ async def logout_user(token_detials: Annotated[dict, Depends(AccessTokenBearer()
 
     jti = token_detials["jti"]
 
-    await add_jti_to_blocklist(jti)
+    await add_jti_to_blocklist(jti, token_detials["exp"])
     return JSONResponse(content={"message": "Logout successful"}, status_code=status.HTTP_200_OK)
 
+@auth_router.post("/logout_all")
+async def logout_user_everywhere(token_detials: Annotated[dict, Depends(access_token_bearer)]):
+    """
+    Log out a user on every device, revoking all their access and refresh tokens
+    Args:
+        token_detials (dict): The details of the access token.
+    Returns:
+        JSONResponse: The logout response.
+    """
+    await revoke_user_tokens(token_detials["user"]["uid"], REFRESH_TOKEN_EXPIRY)
+    return JSONResponse(content={"message": "Logged out everywhere"}, status_code=status.HTTP_200_OK)
+
@@ -0,0 +1,137 @@
+"""
+Production server entrypoint.
+
+Starts uvicorn with uvloop and httptools, one worker per available core by
+default, and splits the database and Redis connection budgets across the
+workers so the totals stay under DB_POOL_TOTAL_LIMIT and
+REDIS_TOTAL_MAX_CONNECTIONS:
+
+    python serve.py [--workers N] [--host HOST] [--port PORT]
+
+The OpenAPI schema is generated once here and loaded by every worker from
+OPENAPI_SCHEMA_PATH. Route traffic on /health/ready, which answers 503
+until a worker's pools are warm.
+
+On SIGTERM each worker stops accepting connections, lets in-flight requests
+finish for up to GRACEFUL_SHUTDOWN_TIMEOUT seconds, then closes its pools.
+"""
+import argparse
+import logging
+import os
+import tempfile
+
+import uvicorn
+
+from database.db_config import Config
+from database.redis import REDIS_BLOCKING_POOL_SIZE, REDIS_POOLS_PER_PROCESS
+
+logger = logging.getLogger("serve")
+
+
+def available_cores() -> int:
+    """Number of cores this process may run on, honouring CPU affinity."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count(requested: int | None = None) -> int:
+    """
+    Number of worker processes to start.
+    Args:
+        requested (int, optional): An explicit count, e.g. from --workers.
+    Returns:
+        int: The requested count, else WEB_CONCURRENCY, else one per core up to
+        WEB_MAX_WORKERS and DB_POOL_TOTAL_LIMIT.
+    Raises:
+        ValueError: If an explicit count exceeds DB_POOL_TOTAL_LIMIT, since
+            every worker needs at least one database connection.
+    """
+    explicit = requested or Config.WEB_CONCURRENCY
+    if explicit:
+        if explicit > Config.DB_POOL_TOTAL_LIMIT:
+            raise ValueError(
+                f"{explicit} workers need at least {explicit} database connections, "
+                f"but DB_POOL_TOTAL_LIMIT is {Config.DB_POOL_TOTAL_LIMIT}"
+            )
+        return explicit
+    return max(1, min(available_cores(), Config.WEB_MAX_WORKERS, Config.DB_POOL_TOTAL_LIMIT))
+
+
+def pool_limits(workers: int) -> dict[str, str]:
+    """
+    Per-worker pool settings that keep the totals under the configured limits.
+    Two thirds of each worker's database budget is kept open in the pool and
+    the rest is overflow for bursts. Each worker's fixed-size blocking Redis
+    pool is taken off the Redis budget before the rest is split.
+    Args:
+        workers (int): The number of worker processes.
+    Returns:
+        dict[str, str]: Environment variables read by Settings in each worker.
+    Raises:
+        ValueError: If REDIS_TOTAL_MAX_CONNECTIONS can't give every pool a connection.
+    """
+    db_per_worker = max(1, Config.DB_POOL_TOTAL_LIMIT // workers)
+    pool_size = max(1, db_per_worker * 2 // 3)
+    redis_shared = Config.REDIS_TOTAL_MAX_CONNECTIONS - workers * REDIS_BLOCKING_POOL_SIZE
+    redis_per_pool = redis_shared // (workers * REDIS_POOLS_PER_PROCESS)
+    if redis_per_pool < 1:
+        raise ValueError(
+            f"{workers} workers need at least {workers * (REDIS_POOLS_PER_PROCESS + REDIS_BLOCKING_POOL_SIZE)} "
+            f"Redis connections, but REDIS_TOTAL_MAX_CONNECTIONS is {Config.REDIS_TOTAL_MAX_CONNECTIONS}"
+        )
+    return {
+        "DB_POOL_SIZE": str(pool_size),
+        "DB_MAX_OVERFLOW": str(db_per_worker - pool_size),
+        "REDIS_MAX_CONNECTIONS": str(redis_per_pool),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    args = parser.parse_args()
+
+    try:
+        workers = worker_count(args.workers)
+        limits = pool_limits(workers)
+    except ValueError as e:
+        parser.error(str(e))
+    # workers are spawned, so they read their pool sizes from the environment
+    os.environ.update(limits)
+
+    # Import the app once before spawning workers so configuration and import
+    # errors fail the launch instead of every worker in a restart loop.
+    import main
+    from startup import write_openapi_schema
+
+    schema_fd, schema_path = tempfile.mkstemp(prefix="openapi-", suffix=".json")
+    os.close(schema_fd)
+    write_openapi_schema(main.app, schema_path)
+    os.environ["OPENAPI_SCHEMA_PATH"] = schema_path
+
+    logger.info("Starting %d workers on %s:%s with %s", workers, args.host, args.port, limits)
+    try:
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            loop="uvloop",
+            http="httptools",
+            lifespan="on",
+            proxy_headers=True,
+            timeout_keep_alive=5,
+            timeout_graceful_shutdown=Config.GRACEFUL_SHUTDOWN_TIMEOUT,
+            access_log=Config.ACCESS_LOG,
+            # leave logging to logging_config so uvicorn's records go through the queue
+            log_config=None,
+        )
+    finally:
+        os.unlink(schema_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+from typing import List
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, desc
+from sqlalchemy import bindparam
+from models.book_model import Book
+from models.tags_model import Tag
+from database.autocomplete import Term
+
+_RECENT_BOOK_TERMS = (
+    select(Book.uid, Book.title, Book.author)
+    .order_by(desc(Book.created_at))
+    .limit(bindparam("limit"))
+)
+_TAG_TERMS = select(Tag.uid, Tag.name)
+
+class AutocompleteService:
+    async def load_terms_service(self, session: AsyncSession, limit: int) -> List[Term]:
+        """
+        Load the terms of the autocomplete index: every tag, then the titles and
+        authors of the most recent books, so a capped index keeps the newest.
+        Args:
+            session (AsyncSession): The database session.
+            limit (int): The maximum number of books to load.
+        Returns:
+            List[Term]: (kind, text, uid) terms in priority order.
+        """
+        tags = await session.exec(_TAG_TERMS)
+        terms: List[Term] = [("tag", name, str(uid)) for uid, name in tags.all()]
+        books = await session.exec(_RECENT_BOOK_TERMS, params={"limit": limit})
+        for uid, title, author in books.all():
+            terms.append(("title", title, str(uid)))
+            terms.append(("author", author, str(uid)))
+        await session.commit()
+        return terms
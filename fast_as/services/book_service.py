@@ -1,42 +1,231 @@
 import logging
+import uuid
+from types import SimpleNamespace
 from typing import List, Optional
 
 from fastapi import HTTPException, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select, desc
+from sqlalchemy import bindparam, func, literal_column, text, union_all, update
 from sqlalchemy.orm import selectinload
-from models.book_model import Book, BookCreate, BookUpdate
+from models.book_model import Book, BookCreate, BookUpdate, BookFilters, BookFacets, FacetCount, BookBulkDeleteResult
+# the statements below configure every mapper when built, which needs every
+# related model imported, whoever imports this module first
+import models.user_model  # noqa: F401
+from services.outbox_service import OutboxService
+from logging_config import HIGH_VOLUME
+from database.response_cache import purge_surrogate_keys, book_surrogate_key, BOOKS_SURROGATE_KEY
+from database.facet_cache import FACET_FIELDS, get_cached_facet_counts, store_facet_counts, adjust_facet_counts
+from database.db_config import Config
+from database.autocomplete import book_terms, publish_autocomplete_changes
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+outbox_service = OutboxService()
+
+# Hot statements are built once so SQLAlchemy's cache key is memoized and the
+# compiled form and the asyncpg prepared statement are reused on every call.
+_ALL_BOOKS_WITH_REVIEWS = select(Book).options(selectinload(Book.reviews))
+_BOOKS_BY_USER = select(Book).where(Book.user_uid == bindparam("user_uid"))
+_BOOKS_BY_UIDS = select(Book).where(Book.uid.in_(bindparam("book_uids", expanding=True)))
+_BOOK_BY_UID_WITH_REVIEWS_AND_TAGS = (
+    select(Book)
+    .where(Book.uid == bindparam("book_uid"))
+    .options(
+        selectinload(Book.reviews),
+        selectinload(Book.tags)
+    )
+)
+
+def _apply_book_filters(statement, filters: Optional[BookFilters], exclude: Optional[str] = None):
+    """Add a WHERE clause for each set facet filter, except the `exclude` field."""
+    for field in FACET_FIELDS:
+        values = getattr(filters, field) if filters is not None else None
+        if values and field != exclude:
+            statement = statement.where(getattr(Book, field).in_(values))
+    return statement
+
+def _facet_counts_statement(filters: Optional[BookFilters] = None):
+    """
+    Grouped counts of every facet field in one UNION ALL round trip. Each
+    field is counted under the other fields' filters but not its own, so the
+    alternatives to a selected value keep their counts.
+    """
+    return union_all(*(
+        _apply_book_filters(
+            select(
+                literal_column(f"'{field}'").label("facet"),
+                getattr(Book, field).label("value"),
+                func.count().label("count"),
+            ).group_by(getattr(Book, field)),
+            filters, exclude=field,
+        )
+        for field in FACET_FIELDS
+    ))
+
+_ALL_FACET_COUNTS = _facet_counts_statement()
+
+# BookReadWithReviewsAndTags built by Postgres in a single round trip
+_BOOK_DOCUMENT_BY_UID = text("""
+    SELECT json_build_object(
+        'title', b.title,
+        'author', b.author,
+        'publisher', b.publisher,
+        'published_date', b.published_date,
+        'page_count', b.page_count,
+        'language', b.language,
+        'uid', b.uid,
+        'user_uid', b.user_uid,
+        'created_at', b.created_at,
+        'updated_at', b.updated_at,
+        'reviews', COALESCE(
+            (SELECT json_agg(json_build_object('content', r.content, 'rating', r.rating))
+             FROM review r WHERE r.book_uid = b.uid),
+            '[]'::json
+        ),
+        'tags', COALESCE(
+            (SELECT json_agg(json_build_object('name', t.name, 'uid', t.uid))
+             FROM tag t JOIN booktag bt ON bt.tag_uid = t.uid WHERE bt.book_uid = b.uid),
+            '[]'::json
+        )
+    )::text
+    FROM book b
+    WHERE b.uid = :book_uid
+""")
+
+# Owner-scoped writes: the ownership check is part of the statement, so a write
+# is one round trip; _BOOK_OWNER only runs on a miss, to tell 404 from 403.
+_BOOK_OWNER = select(Book.uid, Book.user_uid).where(Book.uid == bindparam("book_uid"))
+_BOOK_BY_UID = select(Book).where(Book.uid == bindparam("book_uid"))
+_BOOK_UIDS_IN = select(Book.uid).where(Book.uid.in_(bindparam("book_uids", expanding=True)))
+# fields whose previous values the caches need after an update
+_PREVIOUS_FIELDS = ("title", *FACET_FIELDS)
+# the row before the update; locked so a concurrent update can't slip between
+# the values read here and the ones written
+_PREVIOUS_BOOK = (
+    select(Book.uid, *(getattr(Book, field) for field in _PREVIOUS_FIELDS))
+    .where(Book.uid == bindparam("book_uid"))
+    .with_for_update()
+    .subquery("previous")
+)
+# Reviews and tag links are deleted by ON DELETE CASCADE. Books with more
+# than :batch_size reviews don't match; the worker purges them in batches so
+# no single transaction deletes or locks an unbounded number of rows.
+_DELETE_OWN_BOOK = text("""
+    DELETE FROM book
+    WHERE uid = :book_uid AND user_uid = :owner
+      AND NOT EXISTS (SELECT 1 FROM review WHERE book_uid = :book_uid OFFSET :batch_size)
+    RETURNING uid, title, author, publisher, language
+""")
+_DELETE_REVIEW_BATCH = text("""
+    DELETE FROM review
+    WHERE uid IN (SELECT uid FROM review WHERE book_uid = :book_uid LIMIT :batch_size)
+""")
+_DELETE_BOOK = text("""
+    DELETE FROM book WHERE uid = :book_uid
+    RETURNING uid, title, author, publisher, language
+""")
+
+def _update_own_book(values: dict):
+    return (
+        update(Book)
+        .where(Book.uid == _PREVIOUS_BOOK.c.uid, Book.user_uid == bindparam("owner"))
+        .values(**values)
+        .returning(Book, *(_PREVIOUS_BOOK.c[field].label(f"previous_{field}") for field in _PREVIOUS_FIELDS))
+        .execution_options(synchronize_session=False)
+    )
+
+def _facet_values(book: Book) -> dict:
+    return {field: getattr(book, field) for field in FACET_FIELDS}
+
 class BookService:
-    async def get_all_books_service(self, session: AsyncSession) -> List[Book]:
+    async def get_all_books_service(self, session: AsyncSession, filters: Optional[BookFilters] = None) -> List[Book]:
         try:
             # statement = select(Book).order_by(desc(Book.created_at))
-            statement = select(Book).options(selectinload(Book.reviews))
-            result = await session.exec(statement)
+            result = await session.exec(_apply_book_filters(_ALL_BOOKS_WITH_REVIEWS, filters))
             books = result.all()
             return list(books)
         except Exception as e:
             await session.rollback()
-            logger.error(f"Error getting all books: {str(e)}")
+            logger.error("Error getting all books: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error getting books: {str(e)}"
             )
     
+    async def get_facet_counts_service(self, session: AsyncSession, filters: Optional[BookFilters] = None) -> BookFacets:
+        """
+        Count books per author, publisher and language.
+        Unfiltered counts are served from Redis, where they are kept up to date
+        on every create, update and delete; filtered counts are computed with
+        indexed grouped queries.
+        Args:
+            session (AsyncSession): The database session.
+            filters (BookFilters, optional): The selected facet values.
+        Returns:
+            BookFacets: The FACET_VALUE_LIMIT most common values of each field.
+        """
+        filtered = filters is not None and bool(filters.model_dump(exclude_none=True))
+        counts = None if filtered else await get_cached_facet_counts()
+        if counts is None:
+            try:
+                result = await session.exec(_facet_counts_statement(filters) if filtered else _ALL_FACET_COUNTS)
+                rows = result.all()
+            except Exception as e:
+                await session.rollback()
+                logger.error("Error counting book facets: %s", e)
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Error counting book facets: {str(e)}"
+                )
+            counts = {field: {} for field in FACET_FIELDS}
+            for facet, value, count in rows:
+                counts[facet][value] = count
+            if not filtered:
+                await store_facet_counts(counts)
+
+        limit = Config.FACET_VALUE_LIMIT
+        return BookFacets(**{
+            field: [
+                FacetCount(value=value, count=count)
+                for value, count in sorted(values.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            ]
+            for field, values in counts.items()
+        })
+
+    async def get_books_by_uids_service(self, book_uids: List[str], session: AsyncSession) -> List[Book]:
+        """
+        Get several books with one query, in the order of `book_uids`.
+        UIDs of books that no longer exist are skipped.
+        Args:
+            book_uids (List[str]): The UIDs of the books.
+            session (AsyncSession): The database session.
+        Returns:
+            List[Book]: The books found.
+        """
+        if not book_uids:
+            return []
+        try:
+            result = await session.exec(_BOOKS_BY_UIDS, params={"book_uids": [uuid.UUID(uid) for uid in book_uids]})
+            books = {str(book.uid): book for book in result.all()}
+            return [books[uid] for uid in book_uids if uid in books]
+        except Exception as e:
+            await session.rollback()
+            logger.error("Error getting books %s: %s", book_uids, e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error getting books: {str(e)}"
+            )
+
     async def get_all_books_by_user(self, session: AsyncSession, user_uid: str) -> List[Book]:
         try:
-            statement = select(Book).where(Book.user_uid == user_uid)
             # statement = select(Book).where(Book.user_uid == user_uid).options(selectinload(Book.reviews))
-            result = await session.exec(statement)
+            result = await session.exec(_BOOKS_BY_USER, params={"user_uid": user_uid})
             books = result.all()
             return list(books)
         except Exception as e:
             await session.rollback()
-            logger.error(f"Error getting books for user {user_uid}: {str(e)}")
+            logger.error("Error getting books for user %s: %s", user_uid, e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error getting books: {str(e)}"
@@ -66,18 +255,10 @@ class BookService:
 
     async def get_book_service(self, book_uid: str, session: AsyncSession) -> Book:
         try:
-            statement = (
-                select(Book)
-                .where(Book.uid == book_uid)
-                .options(
-                    selectinload(Book.reviews),
-                    selectinload(Book.tags)   # <-- tags bhi preload
-                )
-            )
-            result = await session.exec(statement)
+            result = await session.exec(_BOOK_BY_UID_WITH_REVIEWS_AND_TAGS, params={"book_uid": book_uid})
             book = result.first()
             if not book:
-                logger.warning(f"Book with UID {book_uid} not found.")
+                logger.info("Book with UID %s not found.", book_uid, extra=HIGH_VOLUME)
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Book not found"
@@ -85,53 +266,136 @@ class BookService:
             return book
         except Exception as e:
             await session.rollback()
-            logger.error(f"Error getting book with UID {book_uid}: {str(e)}")
+            logger.error("Error getting book with UID %s: %s", book_uid, e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error getting book: {str(e)}"
+            )
+
+    async def get_book_document_service(self, book_uid: str, session: AsyncSession) -> str:
+        """
+        Get a book with its reviews and tags as a ready-to-send JSON document.
+        Postgres builds the document in one query, so no ORM objects are
+        hydrated and no second serialization pass is needed.
+        Args:
+            book_uid (str): The UID of the book to retrieve.
+            session (AsyncSession): The database session.
+        Returns:
+            str: The BookReadWithReviewsAndTags JSON document.
+        """
+        try:
+            result = await session.exec(_BOOK_DOCUMENT_BY_UID, params={"book_uid": book_uid})
+            document = result.scalar_one_or_none()
+        except Exception as e:
+            await session.rollback()
+            logger.error("Error getting book document with UID %s: %s", book_uid, e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error getting book: {str(e)}"
             )
+        if document is None:
+            logger.info("Book with UID %s not found.", book_uid, extra=HIGH_VOLUME)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Book not found"
+            )
+        return document
 
     async def create_book_service(self, book_data: BookCreate, session: AsyncSession, user_uid:str) -> Book:
         try:
-            logger.info(f"Creating book with data: {book_data}")
             new_book = Book(**book_data.model_dump())
             new_book.user_uid = user_uid
             session.add(new_book)
+            outbox_service.add_event(session, "book.created", new_book.uid)
             await session.commit()
             await session.refresh(new_book)
-            logger.info(f"Book created with UID: {new_book.uid}")
+            await purge_surrogate_keys(BOOKS_SURROGATE_KEY)
+            await adjust_facet_counts(added=_facet_values(new_book))
+            await publish_autocomplete_changes(added=book_terms(new_book))
+            logger.info("Book created with UID: %s", new_book.uid)
             return new_book
         except Exception as e:
             await session.rollback()
-            logger.error(f"Error creating book: {str(e)}")
+            logger.error("Error creating book: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error creating book: {str(e)}"
             )
 
+    async def _check_owner(self, book_uid: str, session: AsyncSession, user_uid: str, action: str) -> None:
+        """
+        Explain why an owner-scoped write matched no row.
+        Raises:
+            HTTPException: 404 if the book does not exist, 403 if it belongs to another user.
+        """
+        result = await session.exec(_BOOK_OWNER, params={"book_uid": book_uid})
+        book = result.first()
+        if book is None:
+            logger.info("Book with UID %s not found.", book_uid, extra=HIGH_VOLUME)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Book not found"
+            )
+        if str(book.user_uid) != str(user_uid):
+            logger.warning("User %s is not authorized to %s book with UID %s.", user_uid, action, book_uid)
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"You are not authorized to {action} this book"
+            )
+
+    async def _book_deleted(self, book) -> None:
+        """Update the caches and indexes after a book's delete was committed."""
+        await purge_surrogate_keys(BOOKS_SURROGATE_KEY, book_surrogate_key(book.uid))
+        await adjust_facet_counts(removed=_facet_values(book))
+        await publish_autocomplete_changes(removed=book_terms(book))
+
     async def update_book_service(self, book_uid: str, book_data: BookUpdate, session: AsyncSession, user_uid: str) -> Book:
         try:
-            book_to_update = await self.get_book_service(book_uid, session)
-
-            # check if the book belongs to the user
-            if str(book_to_update.user_uid) != str(user_uid):
-                logger.error(f"User {user_uid} is not authorized to update book with UID {book_uid}.")
+            update_data = book_data.model_dump(exclude_unset=True)
+            if not update_data:
+                # nothing to change: no write, outbox event or purge
+                result = await session.exec(_BOOK_BY_UID, params={"book_uid": book_uid})
+                book = result.first()
+                if book is None or str(book.user_uid) != str(user_uid):
+                    await self._check_owner(book_uid, session, user_uid, "update")
+                return book
+            result = await session.exec(
+                _update_own_book(update_data), params={"book_uid": book_uid, "owner": user_uid}
+            )
+            row = result.first()
+            if row is None:
+                await self._check_owner(book_uid, session, user_uid, "update")
+                # the user's book, deleted since the update was issued
                 raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="You are not authorized to update this book"
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Book not found"
                 )
-
-            update_data = book_data.model_dump(exclude_unset=True)
-            for key, value in update_data.items():
-                setattr(book_to_update, key, value)
-            session.add(book_to_update)
+            book_to_update = row[0]
+            previous = SimpleNamespace(
+                uid=book_to_update.uid, **{field: getattr(row, f"previous_{field}") for field in _PREVIOUS_FIELDS}
+            )
+            outbox_service.add_event(session, "book.updated", book_to_update.uid, {"fields": list(update_data)})
             await session.commit()
-            await session.refresh(book_to_update)
-            logger.info(f"Book with UID {book_uid} updated.")
+            previous_facets = _facet_values(previous)
+            facets = _facet_values(book_to_update)
+            if facets != previous_facets:
+                # filtered lists the book moved into are only tagged with the collection key
+                await purge_surrogate_keys(BOOKS_SURROGATE_KEY, book_surrogate_key(book_uid))
+                await adjust_facet_counts(removed=previous_facets, added=facets)
+            else:
+                await purge_surrogate_keys(book_surrogate_key(book_uid))
+            previous_terms = book_terms(previous)
+            terms = book_terms(book_to_update)
+            if terms != previous_terms:
+                await publish_autocomplete_changes(removed=previous_terms, added=terms)
+            logger.info("Book with UID %s updated.", book_uid)
             return book_to_update
+        except HTTPException:
+            await session.rollback()
+            raise
         except Exception as e:
             await session.rollback()
-            logger.error(f"Error updating book with UID {book_uid}: {str(e)}")
+            logger.error("Error updating book with UID %s: %s", book_uid, e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error updating book: {str(e)}"
@@ -139,25 +403,95 @@ class BookService:
         
 
     async def delete_book_service(self, book_uid: str, session: AsyncSession, user_uid: str) -> dict:
+        """
+        Delete a book with its reviews and tag links.
+        Books with more than BOOK_DELETE_BATCH_SIZE reviews are handed to the
+        worker, which deletes their reviews in batches and then the book.
+        Returns:
+            dict: A message and a status, "deleted" or "scheduled".
+        """
         try:
-            book_to_delete = await self.get_book_service(book_uid, session)
-
-            # check if the book belongs to the user
-            if str(book_to_delete.user_uid) != str(user_uid):
-                logger.error(f"User {user_uid} is not authorized to delete book with UID {book_uid}.")
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="You are not authorized to delete this book"
-                )
-
-            await session.delete(book_to_delete)
+            result = await session.exec(
+                _DELETE_OWN_BOOK,
+                params={"book_uid": book_uid, "owner": user_uid, "batch_size": Config.BOOK_DELETE_BATCH_SIZE},
+            )
+            book_to_delete = result.first()
+            if book_to_delete is None:
+                await self._check_owner(book_uid, session, user_uid, "delete")
+                outbox_service.add_event(session, "book.purge", book_uid)
+                await session.commit()
+                logger.info("Book with UID %s scheduled for deletion.", book_uid)
+                return {"message": "Book deletion scheduled", "status": "scheduled"}
+            outbox_service.add_event(session, "book.deleted", book_to_delete.uid)
             await session.commit()
-            logger.info(f"Book with UID {book_uid} deleted.")
-            return {"message": "Book deleted successfully"}
+            await self._book_deleted(book_to_delete)
+            logger.info("Book with UID %s deleted.", book_uid)
+            return {"message": "Book deleted successfully", "status": "deleted"}
+        except HTTPException:
+            await session.rollback()
+            raise
         except Exception as e:
             await session.rollback()
-            logger.error(f"Error deleting book with UID {book_uid}: {str(e)}")
+            logger.error("Error deleting book with UID %s: %s", book_uid, e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error deleting book: {str(e)}"
             )
+
+    async def schedule_book_purges_service(self, book_uids: List[uuid.UUID], session: AsyncSession) -> BookBulkDeleteResult:
+        """
+        Hand many books to the worker for deletion, regardless of owner.
+        Args:
+            book_uids (List[uuid.UUID]): The UIDs of the books to delete.
+            session (AsyncSession): The database session.
+        Returns:
+            BookBulkDeleteResult: The scheduled books and the UIDs that matched none.
+        """
+        try:
+            result = await session.exec(_BOOK_UIDS_IN, params={"book_uids": list(book_uids)})
+            existing = set(result.all())
+            for book_uid in existing:
+                outbox_service.add_event(session, "book.purge", book_uid)
+            await session.commit()
+            logger.info("%d books scheduled for deletion.", len(existing))
+            return BookBulkDeleteResult(
+                scheduled=[uid for uid in book_uids if uid in existing],
+                not_found=[uid for uid in book_uids if uid not in existing],
+            )
+        except Exception as e:
+            await session.rollback()
+            logger.error("Error scheduling book deletions: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error deleting books: {str(e)}"
+            )
+
+    async def purge_book_service(self, book_uid: str, session: AsyncSession) -> int:
+        """
+        Delete a book's reviews BOOK_DELETE_BATCH_SIZE at a time, each batch in
+        its own transaction, then the book. Safe to run again after a failure.
+        Args:
+            book_uid (str): The UID of the book.
+            session (AsyncSession): The database session.
+        Returns:
+            int: The number of reviews deleted in batches.
+        """
+        batch_size = Config.BOOK_DELETE_BATCH_SIZE
+        params = {"book_uid": book_uid, "batch_size": batch_size}
+        deleted = 0
+        while True:
+            result = await session.exec(_DELETE_REVIEW_BATCH, params=params)
+            await session.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                break
+        # reviews added since the last batch go by cascade
+        result = await session.exec(_DELETE_BOOK, params={"book_uid": book_uid})
+        book = result.first()
+        if book is not None:
+            outbox_service.add_event(session, "book.deleted", book.uid)
+        await session.commit()
+        if book is not None:
+            await self._book_deleted(book)
+        logger.info("Book with UID %s purged with %d reviews.", book_uid, deleted)
+        return deleted
@@ -0,0 +1,134 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, delete
+from sqlalchemy import bindparam, update
+from models.outbox_model import OutboxEvent
+from database.db_config import Config
+
+logger = logging.getLogger(__name__)
+
+OutboxHandler = Callable[[OutboxEvent], Awaitable[None]]
+
+# Claim a batch by pushing its available_at past the lease, in one short
+# transaction; SKIP LOCKED lets several dispatchers claim concurrently.
+_CLAIM_EVENTS = (
+    update(OutboxEvent)
+    .where(OutboxEvent.uid.in_(
+        select(OutboxEvent.uid)
+        .where(OutboxEvent.processed_at.is_(None), OutboxEvent.available_at <= bindparam("now"))
+        .order_by(OutboxEvent.available_at)
+        .limit(bindparam("batch_size"))
+        .with_for_update(skip_locked=True)
+    ))
+    .values(available_at=bindparam("lease_until"))
+    .returning(OutboxEvent)
+    .execution_options(synchronize_session=False)
+)
+
+# event_type -> handlers, filled in by the worker at startup
+outbox_handlers: Dict[str, List[OutboxHandler]] = {}
+
+
+def register_outbox_handler(event_type: str, handler: OutboxHandler) -> None:
+    """
+    Register a handler for an outbox event type.
+    Handlers may run more than once for the same event and must be idempotent.
+    Args:
+        event_type (str): The event type, e.g. "book.created".
+        handler (OutboxHandler): The coroutine function to call with the event.
+    """
+    outbox_handlers.setdefault(event_type, []).append(handler)
+
+
+class OutboxService:
+    def add_event(
+        self, session: AsyncSession, event_type: str, aggregate_uid: Any = None, payload: Optional[dict] = None
+    ) -> OutboxEvent:
+        """
+        Stage an outbox event in the session.
+        The event is not committed here; it is written by the caller's own commit,
+        so it exists if and only if the write it describes does.
+        Args:
+            session (AsyncSession): The database session of the write.
+            event_type (str): The event type, e.g. "book.created".
+            aggregate_uid: The UID of the entity the event is about.
+            payload (dict, optional): Extra JSON-serializable event data.
+        Returns:
+            OutboxEvent: The staged event.
+        """
+        event = OutboxEvent(
+            event_type=event_type,
+            aggregate_uid=aggregate_uid,
+            payload=jsonable_encoder(payload or {}),
+        )
+        session.add(event)
+        return event
+
+    async def dispatch_batch(self, session: AsyncSession, batch_size: int | None = None) -> int:
+        """
+        Claim and dispatch one batch of pending events.
+        Events are claimed in a short transaction that leases them for
+        OUTBOX_LEASE_SECONDS, so handlers run without holding row locks or the
+        session's connection; long ones such as batched purges don't stall the
+        rest of the batch. Each event is then marked in its own transaction
+        once all of its handlers succeeded. An event whose dispatcher died is
+        claimed again when its lease runs out, which gives at-least-once delivery.
+        Args:
+            session (AsyncSession): The database session.
+            batch_size (int, optional): The maximum number of events to claim;
+                OUTBOX_BATCH_SIZE by default.
+        Returns:
+            int: The number of events claimed.
+        """
+        now = datetime.now()
+        result = await session.exec(_CLAIM_EVENTS, params={
+            "now": now,
+            "batch_size": batch_size or Config.OUTBOX_BATCH_SIZE,
+            "lease_until": now + timedelta(seconds=Config.OUTBOX_LEASE_SECONDS),
+        })
+        events = result.scalars().all()
+        await session.commit()
+
+        for event in events:
+            try:
+                for handler in outbox_handlers.get(event.event_type, []):
+                    await handler(event)
+                event.processed_at = datetime.now()
+                # an error left from an earlier attempt would keep the row from being purged
+                event.last_error = None
+            except Exception as e:
+                event.attempts += 1
+                event.last_error = str(e)[:1000]
+                if event.attempts >= Config.OUTBOX_MAX_ATTEMPTS:
+                    # give up; the row stays with last_error set for inspection
+                    event.processed_at = datetime.now()
+                    logger.error("Outbox event %s (%s) dead-lettered: %s", event.uid, event.event_type, e)
+                else:
+                    backoff = min(2 ** event.attempts, 300)
+                    event.available_at = datetime.now() + timedelta(seconds=backoff)
+                    logger.warning("Outbox event %s (%s) failed, retrying in %ss: %s", event.uid, event.event_type, backoff, e)
+            session.add(event)
+            await session.commit()
+
+        return len(events)
+
+    async def purge_processed(self, session: AsyncSession, older_than: timedelta) -> None:
+        """
+        Delete processed events older than the given age.
+        Args:
+            session (AsyncSession): The database session.
+            older_than (timedelta): The retention period.
+        """
+        cutoff = datetime.now() - older_than
+        await session.exec(
+            delete(OutboxEvent).where(
+                OutboxEvent.processed_at.is_not(None),
+                OutboxEvent.processed_at < cutoff,
+                OutboxEvent.last_error.is_(None),
+            )
+        )
+        await session.commit()
@@ -1,10 +1,45 @@
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import List
 from sqlmodel.ext.asyncio.session import AsyncSession
-from models.reviews_model import Review, ReviewCreate, ReviewUpdate
+from models.reviews_model import Review, ReviewCreate, ReviewUpdate, ReviewBulkItem, ReviewBulkResult
+from models.book_model import Book
+# the statements below configure every mapper when built, which needs every
+# related model imported, whoever imports this module first
+import models.user_model  # noqa: F401
 from services.book_service import BookService
+from services.outbox_service import OutboxService
+from database.response_cache import purge_surrogate_keys, book_surrogate_key
 from fastapi import HTTPException, status
-from sqlmodel import select
+from sqlmodel import select, insert, delete
+from sqlalchemy import bindparam, update
 
 book_service = BookService()
+outbox_service = OutboxService()
+
+REVIEW_BULK_BATCH_SIZE = 500
+
+# built once so the compiled statement and asyncpg prepared statement are reused
+_REVIEW_BY_UID = select(Review).where(Review.uid == bindparam("review_uid"))
+# owner-scoped writes are one round trip; _REVIEW_EXISTS only runs on a miss,
+# to tell 404 from 403
+_REVIEW_EXISTS = select(Review.uid).where(Review.uid == bindparam("review_uid"))
+_DELETE_OWN_REVIEW = (
+    delete(Review)
+    .where(Review.uid == bindparam("review_uid"), Review.user_uid == bindparam("owner"))
+    .returning(Review.uid, Review.book_uid)
+    .execution_options(synchronize_session=False)
+)
+
+def _update_own_review(values: dict):
+    return (
+        update(Review)
+        .where(Review.uid == bindparam("review_uid"), Review.user_uid == bindparam("owner"))
+        .values(**values)
+        .returning(Review)
+        .execution_options(synchronize_session=False)
+    )
 
 class ReviewService:
     async def add_review_service(
@@ -23,8 +58,10 @@ class ReviewService:
             new_review.user_uid = user_uid
             new_review.book_uid = book.uid
             session.add(new_review)
+            outbox_service.add_event(session, "review.created", new_review.uid, {"book_uid": book.uid})
             await session.commit()
             await session.refresh(new_review)
+            await purge_surrogate_keys(book_surrogate_key(new_review.book_uid))
             return new_review
         except Exception as e:
             await session.rollback()
@@ -37,8 +74,7 @@ class ReviewService:
             self, session: AsyncSession, review_uid: str
     )-> Review:
         try:
-            statement = select(Review).where(Review.uid == review_uid)
-            result = await session.exec(statement)
+            result = await session.exec(_REVIEW_BY_UID, params={"review_uid": review_uid})
             review = result.first()
             if not review:
                 raise HTTPException(
@@ -53,26 +89,50 @@ class ReviewService:
                 detail=f"Error getting review: {str(e)}"
             )
         
+    async def _raise_missed_write(self, session: AsyncSession, review_uid: str, action: str):
+        """
+        Explain why an owner-scoped write matched no row.
+        Raises:
+            HTTPException: 404 if the review does not exist, 403 if it belongs to another user.
+        """
+        result = await session.exec(_REVIEW_EXISTS, params={"review_uid": review_uid})
+        if result.first() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Review not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You are not authorized to {action} this review"
+        )
+
     async def update_review_service(
         self, session: AsyncSession, review_uid: str, user_uid:str, review_data: ReviewUpdate
     ) -> Review:
         try:
-            review_to_update = await self.get_review_service(session, review_uid)
-
-            # 2. Check ownership
-            if str(review_to_update.user_uid) != str(user_uid):
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="You are not authorized to update this review"
-                )
-
             update_data = review_data.model_dump(exclude_unset=True)
-            for key, value in update_data.items():
-                setattr(review_to_update, key, value)
-            session.add(review_to_update)
+            if not update_data:
+                # nothing to change: no write, outbox event or purge
+                result = await session.exec(_REVIEW_BY_UID, params={"review_uid": review_uid})
+                review = result.first()
+                if review is None or str(review.user_uid) != str(user_uid):
+                    await self._raise_missed_write(session, review_uid, "update")
+                return review
+            result = await session.exec(
+                _update_own_review(update_data), params={"review_uid": review_uid, "owner": user_uid}
+            )
+            review_to_update = result.scalars().first()
+            if review_to_update is None:
+                await self._raise_missed_write(session, review_uid, "update")
+            outbox_service.add_event(
+                session, "review.updated", review_to_update.uid, {"book_uid": review_to_update.book_uid}
+            )
             await session.commit()
-            await session.refresh(review_to_update)
+            await purge_surrogate_keys(book_surrogate_key(review_to_update.book_uid))
             return review_to_update
+        except HTTPException:
+            await session.rollback()
+            raise
         except Exception as e:
             await session.rollback()
             raise HTTPException(
@@ -84,24 +144,82 @@ class ReviewService:
             self, session: AsyncSession, review_uid: str, user_uid: str
     )-> dict:
         try:
-            #get the review
-            deleted_review = await self.get_review_service(session, review_uid)
-
-            # 3. Check if the current user is the author of the review
-            if str(deleted_review.user_uid) != str(user_uid):
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="You are not authorized to delete this review"
-                )
-
-            # 4. Delete the review
-            await session.delete(deleted_review)
+            result = await session.exec(_DELETE_OWN_REVIEW, params={"review_uid": review_uid, "owner": user_uid})
+            deleted_review = result.first()
+            if deleted_review is None:
+                await self._raise_missed_write(session, review_uid, "delete")
+            outbox_service.add_event(
+                session, "review.deleted", deleted_review.uid, {"book_uid": deleted_review.book_uid}
+            )
             await session.commit()
+            await purge_surrogate_keys(book_surrogate_key(deleted_review.book_uid))
             return {"message": "Review deleted successfully"}
+        except HTTPException:
+            await session.rollback()
+            raise
         except Exception as e:
             await session.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error deleting review: {str(e)}"
             )
-            
\ No newline at end of file
+            
+
+    async def add_reviews_bulk_service(
+        self, session: AsyncSession, items: List[ReviewBulkItem], user_uid: str,
+        batch_size: int = REVIEW_BULK_BATCH_SIZE,
+    ) -> List[ReviewBulkResult]:
+        """
+        Add many reviews across books in a single transaction.
+        Book existence is checked with one query for all referenced books, and
+        the reviews are inserted in batches of `batch_size` rows.
+        Args:
+            session (AsyncSession): The database session.
+            items (List[ReviewBulkItem]): The reviews to add, each with its book UID.
+            user_uid (str): The UID of the user submitting the reviews.
+            batch_size (int): The number of rows per INSERT statement.
+        Returns:
+            List[ReviewBulkResult]: One result per input item, in input order.
+        """
+        try:
+            book_uids = {item.book_uid for item in items}
+            result = await session.exec(select(Book.uid).where(Book.uid.in_(book_uids)))
+            existing_books = set(result.all())
+
+            results: List[ReviewBulkResult] = []
+            rows = []
+            now = datetime.now()
+            for index, item in enumerate(items):
+                if item.book_uid not in existing_books:
+                    results.append(ReviewBulkResult(
+                        index=index, book_uid=item.book_uid, status="error", detail="Book not found"
+                    ))
+                    continue
+                review_uid = uuid.uuid4()
+                rows.append({
+                    "uid": review_uid,
+                    "content": item.content,
+                    "rating": item.rating,
+                    "user_uid": user_uid,
+                    "book_uid": item.book_uid,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+                results.append(ReviewBulkResult(
+                    index=index, book_uid=item.book_uid, status="created", review_uid=review_uid
+                ))
+
+            for start in range(0, len(rows), batch_size):
+                await session.exec(insert(Review).values(rows[start:start + batch_size]))
+            if rows:
+                book_counts = Counter(str(row["book_uid"]) for row in rows)
+                outbox_service.add_event(session, "review.bulk_created", None, {"book_counts": book_counts})
+            await session.commit()
+            await purge_surrogate_keys(*(book_surrogate_key(uid) for uid in {row["book_uid"] for row in rows}))
+            return results
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error creating reviews: {str(e)}"
+            )
@@ -0,0 +1,179 @@
+import heapq
+import logging
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select
+from sqlalchemy import text
+from models.book_tag_model import BookTag
+from database.db_config import Config
+from database.similar_books import Neighbours, load_similar_books, store_similar_books
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+logger = logging.getLogger(__name__)
+
+# rows of the book x tag matrix multiplied at once, bounds the memory of A @ A.T
+SPARSE_BLOCK_ROWS = 2048
+
+_ALL_BOOK_TAGS = select(BookTag.book_uid, BookTag.tag_uid)
+# the tags of a book and of every book sharing at least one tag with it
+_BOOK_TAGS_OF_NEIGHBOURHOOD = text("""
+    SELECT bt.book_uid, bt.tag_uid
+    FROM booktag bt
+    WHERE bt.book_uid = :book_uid
+       OR bt.book_uid IN (
+           SELECT other.book_uid FROM booktag other
+           WHERE other.tag_uid IN (SELECT tag_uid FROM booktag WHERE book_uid = :book_uid)
+       )
+""")
+
+
+def similarity(shared: int, size_a: int, size_b: int, metric: str) -> float:
+    """
+    Similarity of two tag sets from their sizes and the number of shared tags.
+    Args:
+        metric (str): "jaccard" or "cosine".
+    """
+    if metric == "cosine":
+        return shared / math.sqrt(size_a * size_b)
+    return shared / (size_a + size_b - shared)
+
+def top_k_similar(book_tags: Dict[str, Set[str]], k: int, metric: str = "jaccard") -> Dict[str, Neighbours]:
+    """
+    Compute the k most similar books of every book from their tags.
+    Uses a sparse book x tag matrix when NumPy and SciPy are installed, and an
+    inverted index otherwise; both only touch pairs of books that share a tag.
+    Args:
+        book_tags (Dict[str, Set[str]]): The tag UIDs of each book UID.
+        k (int): The number of similar books to keep per book.
+        metric (str): "jaccard" or "cosine".
+    Returns:
+        Dict[str, list[tuple[str, float]]]: The similar books of each book, most similar first.
+    """
+    if sparse is not None:
+        return _top_k_sparse(book_tags, k, metric)
+    return _top_k_python(book_tags, k, metric)
+
+def _top_k_python(book_tags: Dict[str, Set[str]], k: int, metric: str) -> Dict[str, Neighbours]:
+    books_by_tag: Dict[str, List[str]] = defaultdict(list)
+    for book_uid, tags in book_tags.items():
+        for tag in tags:
+            books_by_tag[tag].append(book_uid)
+
+    similar: Dict[str, Neighbours] = {}
+    for book_uid, tags in book_tags.items():
+        shared: Dict[str, int] = defaultdict(int)
+        for tag in tags:
+            for other in books_by_tag[tag]:
+                if other != book_uid:
+                    shared[other] += 1
+        scores = (
+            (other, similarity(count, len(tags), len(book_tags[other]), metric))
+            for other, count in shared.items()
+        )
+        similar[book_uid] = heapq.nlargest(k, scores, key=lambda item: item[1])
+    return similar
+
+def _top_k_sparse(book_tags: Dict[str, Set[str]], k: int, metric: str) -> Dict[str, Neighbours]:
+    book_uids = list(book_tags)
+    tag_index: Dict[str, int] = {}
+    rows, cols = [], []
+    for row, book_uid in enumerate(book_uids):
+        for tag in book_tags[book_uid]:
+            rows.append(row)
+            cols.append(tag_index.setdefault(tag, len(tag_index)))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(len(book_uids), len(tag_index))
+    )
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+    transposed = matrix.T.tocsc()
+
+    similar: Dict[str, Neighbours] = {}
+    for start in range(0, len(book_uids), SPARSE_BLOCK_ROWS):
+        # shared tag counts of this block of books with every book
+        shared = (matrix[start:start + SPARSE_BLOCK_ROWS] @ transposed).tocsr()
+        for offset in range(shared.shape[0]):
+            row = start + offset
+            lo, hi = shared.indptr[offset], shared.indptr[offset + 1]
+            others, counts = shared.indices[lo:hi], shared.data[lo:hi]
+            keep = others != row
+            others, counts = others[keep], counts[keep]
+            if metric == "cosine":
+                scores = counts / np.sqrt(sizes[row] * sizes[others])
+            else:
+                scores = counts / (sizes[row] + sizes[others] - counts)
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                others, scores = others[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            similar[book_uids[row]] = [(book_uids[i], float(s)) for i, s in zip(others[order], scores[order])]
+    return similar
+
+def _group_by_book(rows: Iterable[Tuple]) -> Dict[str, Set[str]]:
+    book_tags: Dict[str, Set[str]] = defaultdict(set)
+    for book_uid, tag_uid in rows:
+        book_tags[str(book_uid)].add(str(tag_uid))
+    return book_tags
+
+
+class SimilarBookService:
+    async def rebuild_service(self, session: AsyncSession) -> int:
+        """
+        Recompute the similar books of every book and replace the stored lists.
+        Args:
+            session (AsyncSession): The database session.
+        Returns:
+            int: The number of books with stored lists.
+        """
+        result = await session.exec(_ALL_BOOK_TAGS)
+        book_tags = _group_by_book(result.all())
+        await session.commit()
+        similar = top_k_similar(book_tags, Config.SIMILAR_BOOKS_TOP_K, Config.SIMILAR_BOOKS_METRIC)
+        await store_similar_books(similar, replace=True)
+        logger.info("Similar books rebuilt for %d books", len(similar))
+        return len(similar)
+
+    async def refresh_book_service(self, session: AsyncSession, book_uid: str) -> None:
+        """
+        Update the stored lists after a book's tags changed.
+        The book's own list is recomputed. Every book it now shares a tag with,
+        or that was on its previous list, gets the book's new score merged into
+        its list. A list the book drops out of is one entry short until the
+        next rebuild.
+        Args:
+            session (AsyncSession): The database session.
+            book_uid (str): The UID of the book whose tags changed.
+        """
+        book_uid = str(book_uid)
+        result = await session.exec(_BOOK_TAGS_OF_NEIGHBOURHOOD, params={"book_uid": book_uid})
+        book_tags = _group_by_book(result.all())
+        await session.commit()
+        tags = book_tags.get(book_uid, set())
+        k, metric = Config.SIMILAR_BOOKS_TOP_K, Config.SIMILAR_BOOKS_METRIC
+
+        scores = {
+            other: similarity(len(tags & other_tags), len(tags), len(other_tags), metric)
+            for other, other_tags in book_tags.items()
+            if other != book_uid
+        }
+        previous = (await load_similar_books([book_uid]))[book_uid]
+        affected = set(scores) | {other for other, _ in previous}
+        stored = await load_similar_books(affected)
+
+        updates: Dict[str, Neighbours] = {
+            book_uid: heapq.nlargest(k, scores.items(), key=lambda item: item[1]),
+        }
+        for other in affected:
+            neighbours = [(uid, score) for uid, score in stored[other] if uid != book_uid]
+            score = scores.get(other, 0.0)
+            if score > 0:
+                neighbours.append((book_uid, score))
+            updates[other] = heapq.nlargest(k, neighbours, key=lambda item: item[1])
+        await store_similar_books(updates)
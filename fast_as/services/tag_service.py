@@ -4,27 +4,38 @@ from typing import List, Optional
 from fastapi import HTTPException, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select, desc
+from sqlalchemy import bindparam
 from sqlalchemy.orm import selectinload
 from models.tags_model import Tag
 from models.book_model import Book
+# the statements below configure every mapper when built, which needs every
+# related model imported, whoever imports this module first
+import models.user_model  # noqa: F401
 from services.book_service import BookService
+from services.outbox_service import OutboxService
+from database.autocomplete import tag_term, publish_autocomplete_changes
+from logging_config import HIGH_VOLUME
+from database.response_cache import purge_surrogate_keys, book_surrogate_key, tag_surrogate_key, TAGS_SURROGATE_KEY
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 book_service = BookService()
+outbox_service = OutboxService()
+
+# built once so the compiled statements and asyncpg prepared statements are reused
+_ALL_TAGS = select(Tag).order_by(desc(Tag.created_at))
+_TAG_BY_UID = select(Tag).where(Tag.uid == bindparam("tag_uid"))
+_TAG_BY_NAME = select(Tag).where(Tag.name == bindparam("tag_name"))
 
 class TagService:
     async def get_all_tags_service(self, session: AsyncSession) -> List[Tag]:
         try:
-            statement = select(Tag).order_by(desc(Tag.created_at))
-            result = await session.exec(statement)
+            result = await session.exec(_ALL_TAGS)
             tags = result.all()
             return list(tags)
         except Exception as e:
             await session.rollback()
-            logger.error(f"Error getting all tags: {str(e)}")
+            logger.error("Error getting all tags: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error getting tags: {str(e)}"
@@ -32,19 +43,21 @@ class TagService:
         
     async def get_tag_service(self, tag_uid: str, session: AsyncSession) -> Tag:
         try:
-            statement = select(Tag).where(Tag.uid == tag_uid)
-            result = await session.exec(statement)
+            result = await session.exec(_TAG_BY_UID, params={"tag_uid": tag_uid})
             tag = result.first()
             if not tag:
-                logger.warning(f"Tag with UID {tag_uid} not found.")
+                logger.info("Tag with UID %s not found.", tag_uid, extra=HIGH_VOLUME)
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Tag not found"
                 )
             return tag
+        except HTTPException:
+            await session.rollback()
+            raise
         except Exception as e:
             await session.rollback()
-            logger.error(f"Error getting tag with UID {tag_uid}: {str(e)}")
+            logger.error("Error getting tag with UID %s: %s", tag_uid, e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error getting tag: {str(e)}"
@@ -84,22 +97,31 @@ class TagService:
                     detail="You are not authorized to modify tags for this book"
                 )
 
+            purge_keys = {book_surrogate_key(book.uid)}
+            new_tags = []
             for tag_name in tag_names:
-                statement = select(Tag).where(Tag.name == tag_name)
-                result = await session.exec(statement)
+                result = await session.exec(_TAG_BY_NAME, params={"tag_name": tag_name})
                 tag = result.first()
 
                 if not tag:  # create new tag if not exists
                     tag = Tag(name=tag_name)
                     session.add(tag)
                     await session.flush()
+                    purge_keys.add(TAGS_SURROGATE_KEY)
+                    new_tags.append(tag)
 
                 if tag not in book.tags:
                     book.tags.append(tag)
+                    purge_keys.add(tag_surrogate_key(tag.uid))
 
             session.add(book)
+            outbox_service.add_event(
+                session, "book.tags_changed", book.uid, {"tag_uids": [tag.uid for tag in book.tags]}
+            )
             await session.commit()
             await session.refresh(book)
+            await purge_surrogate_keys(*purge_keys)
+            await publish_autocomplete_changes(added=[tag_term(tag) for tag in new_tags])
             return book
     
     async def remove_tag_from_book_service(self, book_uid: str, tag_uid: str, session: AsyncSession, user_uid: str):
@@ -115,8 +137,7 @@ class TagService:
             )
 
         # tag fetch karo
-        statement = select(Tag).where(Tag.uid == tag_uid)
-        result = await session.exec(statement)
+        result = await session.exec(_TAG_BY_UID, params={"tag_uid": tag_uid})
         tag = result.first()
 
         if not tag or tag not in book.tags:
@@ -129,7 +150,11 @@ class TagService:
         book.tags.remove(tag)
 
         session.add(book)
+        outbox_service.add_event(
+            session, "book.tags_changed", book.uid, {"tag_uids": [t.uid for t in book.tags], "removed_tag_uid": tag.uid}
+        )
         await session.commit()
         await session.refresh(book)
+        await purge_surrogate_keys(book_surrogate_key(book.uid), tag_surrogate_key(tag.uid))
         return book
 
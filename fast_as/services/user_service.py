@@ -1,8 +1,88 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
-from models.user_model import User, UserCreate
+from typing import List
+from pydantic import TypeAdapter
+from models.user_model import (
+    User, UserCreate, UserRead, UserProfile, UserBookItem, UserReviewItem, UserBookPage, UserReviewPage
+)
+from models.book_model import Book
+from models.reviews_model import Review
 from fastapi import HTTPException, status
-from sqlmodel import select
-from utils import generate_pswd_hash
+from sqlmodel import select, desc
+from sqlalchemy import bindparam, text, tuple_, update
+from utils import generate_pswd_hash, encode_cursor, decode_cursor
+
+# Built once so SQLAlchemy's cache key is memoized and the compiled form and
+# the asyncpg prepared statement are reused on every call.
+_USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+_USER_BY_UID = select(User).where(User.uid == bindparam("user_uid"))
+
+# a role change bumps the claims version in the same statement, so tokens
+# issued with the old role can be told apart
+_UPDATE_ROLE = (
+    update(User)
+    .where(User.uid == bindparam("user_uid"))
+    .values(role=bindparam("new_role"), claims_version=User.claims_version + 1)
+    .returning(User.claims_version)
+    .execution_options(synchronize_session=False)
+)
+
+# The profile's collection sizes and the first page of each collection in one
+# round trip. :page_size is one more than the page so the query also tells
+# whether a next page exists.
+_USER_PROFILE_COLLECTIONS = text("""
+    SELECT
+        (SELECT count(*) FROM book WHERE user_uid = :user_uid) AS book_count,
+        (SELECT count(*) FROM review WHERE user_uid = :user_uid) AS review_count,
+        COALESCE(
+            (SELECT json_agg(p ORDER BY p.created_at DESC, p.uid DESC) FROM (
+                SELECT b.uid, b.title, b.created_at FROM book b
+                WHERE b.user_uid = :user_uid
+                ORDER BY b.created_at DESC, b.uid DESC
+                LIMIT :page_size
+            ) p),
+            '[]'::json
+        )::text AS books,
+        COALESCE(
+            (SELECT json_agg(p ORDER BY p.created_at DESC, p.uid DESC) FROM (
+                SELECT r.uid, r.book_uid, r.content, r.rating, r.created_at FROM review r
+                WHERE r.user_uid = :user_uid
+                ORDER BY r.created_at DESC, r.uid DESC
+                LIMIT :page_size
+            ) p),
+            '[]'::json
+        )::text AS reviews
+""")
+
+# keyset pages, newest first; served by the (user_uid, created_at, uid) indexes
+_USER_BOOKS_FIRST_PAGE = (
+    select(Book.uid, Book.title, Book.created_at)
+    .where(Book.user_uid == bindparam("user_uid"))
+    .order_by(desc(Book.created_at), desc(Book.uid))
+    .limit(bindparam("page_size"))
+)
+_USER_BOOKS_AFTER_CURSOR = _USER_BOOKS_FIRST_PAGE.where(
+    tuple_(Book.created_at, Book.uid) < tuple_(bindparam("created_at"), bindparam("uid"))
+)
+_USER_REVIEWS_FIRST_PAGE = (
+    select(Review.uid, Review.book_uid, Review.content, Review.rating, Review.created_at)
+    .where(Review.user_uid == bindparam("user_uid"))
+    .order_by(desc(Review.created_at), desc(Review.uid))
+    .limit(bindparam("page_size"))
+)
+_USER_REVIEWS_AFTER_CURSOR = _USER_REVIEWS_FIRST_PAGE.where(
+    tuple_(Review.created_at, Review.uid) < tuple_(bindparam("created_at"), bindparam("uid"))
+)
+
+_book_items_adapter = TypeAdapter(List[UserBookItem])
+_review_items_adapter = TypeAdapter(List[UserReviewItem])
+
+def _page(items: list, limit: int, page_model):
+    """Trim the extra row fetched beyond `limit` and turn it into a next-page cursor."""
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].uid)
+    return page_model(items=items, next_cursor=next_cursor)
 
 class UserService:
     async def get_user_by_email(self,email:str, session: AsyncSession) -> User | None:
@@ -14,10 +94,110 @@ class UserService:
         Returns:
             User: The user object.
         """
-        statement = select(User).where(User.email == email)
-        result = await session.exec(statement)
+        result = await session.exec(_USER_BY_EMAIL, params={"email": email})
         user = result.first()
         return user
+
+    async def get_user_by_uid(self, user_uid: str, session: AsyncSession) -> User | None:
+        """
+        Get user by UID
+        Args:
+            user_uid (str): The UID of the user to retrieve.
+            session (AsyncSession): The database session.
+        Returns:
+            User: The user object, or None if there is none.
+        """
+        result = await session.exec(_USER_BY_UID, params={"user_uid": user_uid})
+        return result.first()
+
+    async def update_role(self, user_uid: str, role: str, session: AsyncSession) -> int:
+        """
+        Change a user's role and bump their claims version.
+        Args:
+            user_uid (str): The UID of the user.
+            role (str): The new role.
+            session (AsyncSession): The database session.
+        Returns:
+            int: The user's new claims version.
+        """
+        result = await session.exec(_UPDATE_ROLE, params={"user_uid": user_uid, "new_role": role})
+        claims_version = result.scalar_one_or_none()
+        if claims_version is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+        await session.commit()
+        return claims_version
+    
+    async def get_profile(self, user: User, session: AsyncSession, limit: int) -> UserProfile:
+        """
+        Get a user's profile with the sizes and first pages of their collections.
+        The user is the one already loaded for the request, so it is not looked up again.
+        Args:
+            user (User): The user.
+            session (AsyncSession): The database session.
+            limit (int): The page size of each collection.
+        Returns:
+            UserProfile: The profile, counts, first pages and next-page cursors.
+        """
+        result = await session.exec(
+            _USER_PROFILE_COLLECTIONS, params={"user_uid": user.uid, "page_size": limit + 1}
+        )
+        book_count, review_count, books, reviews = result.one()
+        return UserProfile(
+            **UserRead.model_validate(user, from_attributes=True).model_dump(),
+            book_count=book_count,
+            review_count=review_count,
+            books=_page(_book_items_adapter.validate_json(books), limit, UserBookPage),
+            reviews=_page(_review_items_adapter.validate_json(reviews), limit, UserReviewPage),
+        )
+
+    async def get_books_page(
+        self, user_uid: str, session: AsyncSession, limit: int, cursor: str | None = None
+    ) -> UserBookPage:
+        """
+        Get a page of a user's books, newest first.
+        Args:
+            user_uid (str): The UID of the user.
+            session (AsyncSession): The database session.
+            limit (int): The page size.
+            cursor (str, optional): The next_cursor of the previous page.
+        Returns:
+            UserBookPage: The books and the cursor of the next page, if any.
+        """
+        statement, params = self._keyset(_USER_BOOKS_FIRST_PAGE, _USER_BOOKS_AFTER_CURSOR, user_uid, limit, cursor)
+        result = await session.exec(statement, params=params)
+        items = [UserBookItem.model_validate(row, from_attributes=True) for row in result.all()]
+        return _page(items, limit, UserBookPage)
+
+    async def get_reviews_page(
+        self, user_uid: str, session: AsyncSession, limit: int, cursor: str | None = None
+    ) -> UserReviewPage:
+        """
+        Get a page of a user's reviews, newest first.
+        Args:
+            user_uid (str): The UID of the user.
+            session (AsyncSession): The database session.
+            limit (int): The page size.
+            cursor (str, optional): The next_cursor of the previous page.
+        Returns:
+            UserReviewPage: The reviews and the cursor of the next page, if any.
+        """
+        statement, params = self._keyset(_USER_REVIEWS_FIRST_PAGE, _USER_REVIEWS_AFTER_CURSOR, user_uid, limit, cursor)
+        result = await session.exec(statement, params=params)
+        items = [UserReviewItem.model_validate(row, from_attributes=True) for row in result.all()]
+        return _page(items, limit, UserReviewPage)
+
+    def _keyset(self, first_page, after_cursor, user_uid: str, limit: int, cursor: str | None):
+        params = {"user_uid": user_uid, "page_size": limit + 1}
+        if cursor is None:
+            return first_page, params
+        try:
+            params["created_at"], params["uid"] = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        return after_cursor, params
     
     async def user_exists(self, email: str, session: AsyncSession) -> User | None:
         """
@@ -49,4 +229,19 @@ class UserService:
         session.add(new_user)
         await session.commit()
         await session.refresh(new_user)
-        return new_user
\ No newline at end of file
+        return new_user
+
+    async def update_password_hash(self, user: User, password_hashed: str, session: AsyncSession) -> User:
+        """
+        Replace a user's password hash, e.g. after a bcrypt cost upgrade.
+        Args:
+            user (User): The user to update.
+            password_hashed (str): The new password hash.
+            session (AsyncSession): The database session.
+        Returns:
+            User: The updated user object.
+        """
+        user.password_hashed = password_hashed
+        session.add(user)
+        await session.commit()
+        return user
@@ -0,0 +1,121 @@
+"""
+Worker warm-up.
+
+The app starts serving (and answers /health/live) as soon as it is imported.
+`warm_up` then runs in the background and sets `app.state.ready` once the
+database pool holds DB_POOL_SIZE open connections, Redis answers, the bcrypt
+cost is configured and the OpenAPI schema is built, so /health/ready only
+routes traffic to a worker whose first requests will not pay for any of it.
+"""
+import asyncio
+import json
+import logging
+import time
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import text
+from redis.exceptions import RedisError
+from database.db_config import Config
+from database.connection import Session, engine, pool_occupancy
+from database.redis import get_token_blocklist, get_response_cache_client
+from database.autocomplete import Term
+from services.autocomplete_service import AutocompleteService
+from utils import calibrate_pswd_hash_rounds, configure_pswd_hash_rounds
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_MAX_BACKOFF = 5.0
+
+autocomplete_service = AutocompleteService()
+
+async def load_autocomplete_terms() -> list[Term]:
+    """Load the autocomplete index terms; run by the background sync, not warm-up."""
+    async with Session() as session:
+        return await autocomplete_service.load_terms_service(session, Config.AUTOCOMPLETE_MAX_ENTRIES)
+
+async def warm_db_pool(size: int) -> None:
+    """
+    Open `size` pooled connections at once, so the pool is full before traffic arrives.
+    Args:
+        size (int): The number of connections to open, normally DB_POOL_SIZE.
+    """
+    async def checkout() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(checkout() for _ in range(size)))
+    # the warm-up checkouts are not traffic
+    pool_occupancy.reset()
+
+async def warm_redis() -> None:
+    """Open one connection in each Redis client's pool."""
+    await asyncio.gather(get_token_blocklist().ping(), get_response_cache_client().ping())
+
+async def configure_password_hashing() -> None:
+    """Use PASSWORD_HASH_ROUNDS, or calibrate the bcrypt cost on this machine."""
+    rounds = Config.PASSWORD_HASH_ROUNDS
+    if rounds is None:
+        rounds = await run_in_threadpool(calibrate_pswd_hash_rounds, Config.PASSWORD_HASH_TARGET_MS)
+    configure_pswd_hash_rounds(rounds)
+
+def load_openapi_schema(app: FastAPI) -> None:
+    """
+    Set the app's OpenAPI schema from OPENAPI_SCHEMA_PATH when configured,
+    otherwise generate it now rather than on the first docs request.
+    Args:
+        app (FastAPI): The application.
+    """
+    if app.openapi_schema is not None:
+        return
+    if Config.OPENAPI_SCHEMA_PATH:
+        try:
+            with open(Config.OPENAPI_SCHEMA_PATH, "rb") as f:
+                app.openapi_schema = json.load(f)
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load OpenAPI schema from %s: %s", Config.OPENAPI_SCHEMA_PATH, e)
+    app.openapi()
+
+def write_openapi_schema(app: FastAPI, path: str) -> None:
+    """
+    Write the app's OpenAPI schema to a file for workers to load.
+    Args:
+        app (FastAPI): The application.
+        path (str): The file to write.
+    """
+    with open(path, "w") as f:
+        json.dump(app.openapi(), f, separators=(",", ":"))
+
+async def warm_up(app: FastAPI) -> None:
+    """
+    Warm the worker up and set `app.state.ready`.
+    Steps that fail because Postgres or Redis is not reachable yet are retried
+    with backoff; the worker stays unready until all have succeeded.
+    Args:
+        app (FastAPI): The application.
+    """
+    start = time.perf_counter()
+    load_openapi_schema(app)
+    steps = {
+        "password_hashing": configure_password_hashing,
+        "database": lambda: warm_db_pool(Config.DB_POOL_SIZE),
+        "redis": warm_redis,
+    }
+    backoff = 0.1
+    while steps:
+        results = await asyncio.gather(*(step() for step in steps.values()), return_exceptions=True)
+        for name, result in list(zip(steps, results)):
+            if result is None:
+                del steps[name]
+            elif isinstance(result, (OSError, SQLAlchemyError, RedisError)):
+                logger.warning("Warm-up step %s failed, retrying: %s", name, result)
+            else:
+                # not a connectivity problem, retrying will not help
+                logger.error("Warm-up step %s failed, worker stays unready", name, exc_info=result)
+                return
+        if steps:
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, WARM_UP_MAX_BACKOFF)
+    app.state.ready = True
+    logger.info("Worker ready in %.0f ms", (time.perf_counter() - start) * 1000)
@@ -0,0 +1,237 @@
+import inspect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "bookhub-api"
+# OTLP status codes
+STATUS_ERROR = 2
+
+
+class Trace:
+    """The spans of one request, exported together once its root span ends."""
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: list[Span] = []
+
+
+class Span:
+    """A timed operation within a trace. Ended spans are appended to their trace."""
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: str | None, attributes: dict | None = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: str | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: BaseException | None = None) -> None:
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        # list.append is atomic, so spans ended in the thread pool are safe
+        self.trace.spans.append(self)
+
+
+# The span that new spans become children of. Context variables follow the
+# request through awaits, tasks, run_in_threadpool and SQLAlchemy's greenlets,
+# so nothing needs to be passed through the route handlers.
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+def start_span(name: str, attributes: dict | None = None) -> Span | None:
+    """
+    Start a child of the current span without making it current, for hooks
+    that can't wrap the operation in a with block; end it with `end_span`.
+    Returns:
+        Span | None: The span, or None outside a sampled trace.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+def end_span(span: Span | None, error: BaseException | None = None) -> None:
+    if span is not None:
+        span.end(error)
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """
+    Time the enclosed block as a child of the current span. Outside a sampled
+    trace this does nothing and yields None.
+    Args:
+        name (str): The span name, e.g. "jwt.decode".
+        attributes: Span attributes.
+    """
+    child = start_span(name, attributes)
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    error = None
+    try:
+        yield child
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end(error)
+
+def traced(name: str) -> Callable:
+    """Decorator running a function, sync or async, inside `span(name)`."""
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def start_trace(name: str, trace_id: str | None = None, parent_id: str | None = None) -> Iterator[Span]:
+    """
+    Start a trace with a root span and make it current; the trace is exported
+    when the root span ends.
+    Args:
+        name (str): The root span name.
+        trace_id (str, optional): A trace ID to continue, e.g. from a traceparent header.
+        parent_id (str, optional): The caller's span ID.
+    """
+    root = Span(Trace(trace_id or os.urandom(16).hex()), name, parent_id)
+    token = _current_span.set(root)
+    error = None
+    try:
+        yield root
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        root.end(error)
+        get_span_exporter().export(root.trace)
+
+
+def _attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+def to_otlp_json(trace: Trace) -> dict:
+    """
+    Render a trace as an OTLP/JSON ExportTraceServiceRequest, the format the
+    OpenTelemetry collector's file exporter writes.
+    """
+    spans = []
+    for span in trace.spans:
+        entry = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [_attribute(key, value) for key, value in span.attributes.items()],
+        }
+        if span.parent_id:
+            entry["parentSpanId"] = span.parent_id
+        if span.error:
+            entry["status"] = {"code": STATUS_ERROR, "message": span.error}
+        spans.append(entry)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [
+            _attribute("service.name", SERVICE_NAME), _attribute("process.pid", os.getpid()),
+        ]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+    }]}
+
+
+class FileSpanExporter:
+    """
+    Append finished traces to a file, one OTLP/JSON document per line.
+    Traces are serialized and written by a background thread, so ending a
+    request never waits on the disk.
+    Args:
+        path (str): The trace file; each worker appends whole lines to it.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(trace)
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as file:
+            while True:
+                trace = self._queue.get()
+                if trace is None:
+                    return
+                try:
+                    file.write(json.dumps(to_otlp_json(trace), default=str) + "\n")
+                    if self._queue.empty():
+                        file.flush()
+                except (OSError, TypeError, ValueError) as e:
+                    logger.warning("Exporting trace %s failed: %s", trace.trace_id, e)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Write the queued traces and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+_exporter: FileSpanExporter | None = None
+
+def get_span_exporter() -> FileSpanExporter:
+    global _exporter
+    if _exporter is None:
+        from database.db_config import Config
+        _exporter = FileSpanExporter(Config.TRACE_FILE)
+    return _exporter
+
+def shutdown_tracing() -> None:
+    if _exporter is not None:
+        _exporter.shutdown()
@@ -1,16 +1,86 @@
-from passlib.context import CryptContext
 from datetime import timedelta, datetime
+import base64
 import jwt
 from database.db_config import Config
+from logging_config import HIGH_VOLUME
+from tracing import traced
 import uuid
 import logging
+import math
+import time
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
 
 ACCESS_TOKEN_EXPIRY = 3600
+REFRESH_TOKEN_EXPIRY = 7 * 24 * 3600
 
 #password hashing
 
-pwd_context = CryptContext(schemes=["bcrypt"])
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    """
+    The password hashing context, created on first use so importing the app
+    does not load passlib and the bcrypt backend.
+    Returns:
+        CryptContext: The process-wide hashing context.
+    """
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"])
+
+# bcrypt cost bounds used by calibration; 10 is the lowest cost we accept
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 15
+CALIBRATION_PASSWORD = "calibration-password"
+
+def measure_pswd_verify_time(rounds: int, samples: int = 3) -> float:
+    """
+    Measure how long one bcrypt verification takes on this machine.
+    Args:
+        rounds (int): The bcrypt cost (log2 of the iteration count).
+        samples (int): The number of verifications to time; the fastest is kept.
+    Returns:
+        float: The verification time in seconds.
+    """
+    handler = get_pwd_context().handler("bcrypt").using(rounds=rounds)
+    hashed = handler.hash(CALIBRATION_PASSWORD)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.verify(CALIBRATION_PASSWORD, hashed)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def calibrate_pswd_hash_rounds(target_ms: float) -> int:
+    """
+    Pick the highest bcrypt cost whose verify time stays within the target.
+    The cost is measured once at BCRYPT_MIN_ROUNDS and extrapolated, since each
+    extra round doubles the work.
+    Args:
+        target_ms (float): The verify time budget in milliseconds.
+    Returns:
+        int: The bcrypt cost, clamped to [BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS].
+    """
+    base_ms = measure_pswd_verify_time(BCRYPT_MIN_ROUNDS) * 1000
+    extra_rounds = int(math.floor(math.log2(target_ms / base_ms))) if target_ms > base_ms else 0
+    rounds = max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, BCRYPT_MIN_ROUNDS + extra_rounds))
+    logger.info(
+        "bcrypt calibrated to %d rounds (%.1f ms at %d rounds, target %.0f ms)",
+        rounds, base_ms, BCRYPT_MIN_ROUNDS, target_ms,
+    )
+    return rounds
+
+def configure_pswd_hash_rounds(rounds: int) -> None:
+    """
+    Hash new passwords with the given bcrypt cost.
+    Existing hashes below this cost are reported by `needs_update` and upgraded
+    on the next successful login. Higher-cost hashes are left alone.
+    Args:
+        rounds (int): The bcrypt cost.
+    """
+    get_pwd_context().update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
 
+@traced("password.hash")
 def generate_pswd_hash(password: str) -> str:
     """
     Generate a hashed password.
@@ -19,8 +89,9 @@ def generate_pswd_hash(password: str) -> str:
     Returns:
         str: The hashed password.
     """
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
+@traced("password.verify")
 def verify_pswd_hash(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a hashed password.
@@ -30,7 +101,20 @@ def verify_pswd_hash(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: True if the password matches, False otherwise.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+@traced("password.verify")
+def verify_and_update_pswd_hash(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verify a hashed password and rehash it if its cost is outdated.
+    Args:
+        plain_password (str): The plain password to verify.
+        hashed_password (str): The hashed password to verify against.
+    Returns:
+        tuple[bool, str | None]: Whether the password matches, and a new hash
+        to store if the old one needs an update.
+    """
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
 
 #jwt token generation and verification
 
@@ -50,6 +134,8 @@ def create_access_token(user_data: dict, expiry: timedelta | None = None, refres
     payload["exp"] = int(expire_time.timestamp())  # <-- FIX: use Unix timestamp
     payload['jti'] = str(uuid.uuid4())
     payload['refresh'] = refresh
+    # issue time in ms, compared with the user's revocation epoch
+    payload['epoch'] = int(time.time() * 1000)
 
     token = jwt.encode(
         payload=payload,
@@ -60,6 +146,7 @@ def create_access_token(user_data: dict, expiry: timedelta | None = None, refres
     return token
 
 #decode jwt token
+@traced("jwt.decode")
 def decode_token(token: str) -> dict:
     """
     Decode a JWT token.
@@ -76,7 +163,38 @@ def decode_token(token: str) -> dict:
         )
         return token_data
     except jwt.PyJWTError as e:
-        logging.exception(f"Error decoding token: {e}")
+        logger.info("Error decoding token: %s", e, extra=HIGH_VOLUME)
         return None
         
-    
\ No newline at end of file
+    
+
+#keyset pagination cursors
+
+def encode_cursor(created_at: datetime, uid: uuid.UUID) -> str:
+    """
+    Encode the position after a row in a (created_at, uid) descending order.
+    Args:
+        created_at (datetime): The created_at of the last row of a page.
+        uid (uuid.UUID): The uid of that row, which breaks created_at ties.
+    Returns:
+        str: An opaque, URL-safe cursor.
+    """
+    raw = f"{created_at.isoformat()}|{uid}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """
+    Decode a cursor made by `encode_cursor`.
+    Args:
+        cursor (str): The cursor.
+    Returns:
+        tuple[datetime, uuid.UUID]: The created_at and uid of the row before the page.
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, uid = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(uid)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
@@ -0,0 +1,152 @@
+"""
+Background worker entrypoint.
+
+Drains the transactional outbox written by the services and runs the
+handlers registered for each event type, and decays the trending scores.
+Run it next to the API:
+
+    python worker.py
+
+Offline jobs run once and exit, e.g. from cron:
+
+    python worker.py --rebuild-similar-books
+"""
+import argparse
+import asyncio
+import logging
+import signal
+from datetime import timedelta
+
+from database.connection import Session, engine
+from database.redis import close_redis_clients
+# import every table model so relationship mappers can be configured
+from models.book_model import Book
+from models.user_model import User
+from models.reviews_model import Review
+from models.tags_model import Tag
+from models.book_tag_model import BookTag
+from database.db_config import Config
+from models.outbox_model import OutboxEvent
+from services.outbox_service import OutboxService, register_outbox_handler
+from services.similar_book_service import SimilarBookService
+from services.book_service import BookService
+from database.trending import record_book_reviews, remove_book, decay_trending
+from database.similar_books import delete_similar_books
+from logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+outbox_service = OutboxService()
+similar_book_service = SimilarBookService()
+book_service = BookService()
+
+PURGE_INTERVAL = 3600
+
+
+async def count_review_for_trending(event: OutboxEvent) -> None:
+    await record_book_reviews(event.uid, {event.payload["book_uid"]: 1})
+
+async def count_bulk_reviews_for_trending(event: OutboxEvent) -> None:
+    await record_book_reviews(event.uid, event.payload["book_counts"])
+
+async def remove_deleted_book_from_trending(event: OutboxEvent) -> None:
+    await remove_book(event.aggregate_uid)
+
+async def refresh_similar_books(event: OutboxEvent) -> None:
+    async with Session() as session:
+        await similar_book_service.refresh_book_service(session, event.aggregate_uid)
+
+async def remove_deleted_book_from_similar(event: OutboxEvent) -> None:
+    await delete_similar_books(event.aggregate_uid)
+
+async def purge_book(event: OutboxEvent) -> None:
+    async with Session() as session:
+        await book_service.purge_book_service(event.aggregate_uid, session)
+
+
+def register_handlers() -> None:
+    """Register the outbox handlers this worker runs."""
+    register_outbox_handler("review.created", count_review_for_trending)
+    register_outbox_handler("review.bulk_created", count_bulk_reviews_for_trending)
+    register_outbox_handler("book.deleted", remove_deleted_book_from_trending)
+    register_outbox_handler("book.tags_changed", refresh_similar_books)
+    register_outbox_handler("book.deleted", remove_deleted_book_from_similar)
+    register_outbox_handler("book.purge", purge_book)
+
+
+async def run_dispatcher(stop: asyncio.Event) -> None:
+    """Dispatch outbox batches until `stop` is set, sleeping only when the outbox is drained."""
+    while not stop.is_set():
+        try:
+            async with Session() as session:
+                claimed = await outbox_service.dispatch_batch(session, Config.OUTBOX_BATCH_SIZE)
+        except Exception:
+            logger.exception("Outbox dispatch failed")
+            claimed = 0
+
+        if claimed < Config.OUTBOX_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=Config.OUTBOX_POLL_INTERVAL)
+            except TimeoutError:
+                pass
+
+
+async def run_purger(stop: asyncio.Event) -> None:
+    """Delete processed outbox events past their retention period."""
+    while not stop.is_set():
+        try:
+            async with Session() as session:
+                await outbox_service.purge_processed(
+                    session, timedelta(hours=Config.OUTBOX_RETENTION_HOURS)
+                )
+        except Exception:
+            logger.exception("Outbox purge failed")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=PURGE_INTERVAL)
+        except TimeoutError:
+            pass
+
+
+async def run_trending_decay(stop: asyncio.Event) -> None:
+    """Decay the trending scores every TRENDING_DECAY_INTERVAL seconds."""
+    while not stop.is_set():
+        try:
+            await decay_trending(Config.TRENDING_DECAY_INTERVAL)
+        except Exception:
+            logger.exception("Trending decay failed")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=Config.TRENDING_DECAY_INTERVAL)
+        except TimeoutError:
+            pass
+
+
+async def rebuild_similar_books() -> None:
+    """Recompute the similar books of every book, then exit."""
+    async with Session() as session:
+        await similar_book_service.rebuild_service(session)
+    await engine.dispose()
+    await close_redis_clients()
+
+
+async def main() -> None:
+    register_handlers()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info("Worker started")
+    await asyncio.gather(run_dispatcher(stop), run_purger(stop), run_trending_decay(stop))
+    await engine.dispose()
+    await close_redis_clients()
+    logger.info("Worker stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild-similar-books", action="store_true")
+    args = parser.parse_args()
+
+    setup_logging()
+    asyncio.run(rebuild_similar_books() if args.rebuild_similar_books else main())